@@ -1,8 +1,19 @@
+from __future__ import annotations
+
 import os
-from flask import Flask
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import Flask, g, has_app_context, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache, TemplateError
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -20,21 +31,320 @@ def _fix_database_url(url: str) -> str:
     return url
 
 
-def create_app():
-    load_dotenv()
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _conn_record):
+    """
+    SQLite lokal: WAL supaya pembaca tidak diblok penulis,
+    synchronous=NORMAL supaya tidak fsync penuh di setiap commit,
+    foreign_keys=ON supaya ON DELETE CASCADE jalan seperti di Postgres.
+    """
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.execute("PRAGMA cache_size=-64000")
+    cur.close()
+
+
+# ============================================================
+# Dev: hitung query per request (deteksi N+1)
+# ============================================================
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_queries(conn, cursor, statement, parameters, context, executemany):
+    # set_config tenant/bypass RLS (Postgres, tiap transaksi) bukan query view:
+    # tidak dihitung, jadi budget sama di SQLite lokal dan Postgres produksi
+    if has_app_context() and not statement.startswith("SELECT set_config("):
+        log = g.get("sql_log")
+        if log is not None:
+            log.append(statement)
+
+
+def query_budget(limit: int | None):
+    """
+    Batas query GET untuk satu view (dipasang di bawah @bp.route):
+
+        @bp.get("/dashboard")
+        @query_budget(4)
+        def dashboard(): ...
+
+    Batasnya jumlah query saat cache master/dashboard masih dingin (worker baru,
+    atau setelah COA ditulis), karena itu kasus terburuk yang tetap harus lolos;
+    set_config tenant tidak dihitung. Dicek tests/test_query_budget.py.
+    POST / view tanpa decorator pakai batas umum SQL_QUERY_WARN.
+    query_budget(None): tidak dicek sama sekali (operasi massal admin).
+    """
+
+    def deco(view):
+        view.query_budget = limit
+        return view
+
+    return deco
+
+
+def _install_query_counter(app: Flask) -> None:
+    """
+    Mode debug / SQL_QUERY_STRICT: kalau satu request lewat batas query-nya,
+    log semua statement-nya supaya N+1 ketahuan sebelum naik ke produksi.
+    SQL_QUERY_STRICT=1 (dipakai di CI/staging): request yang lewat batas
+    langsung gagal (500), jadi regresi N+1 tidak bisa lolos diam-diam.
+    """
+
+    @app.before_request
+    def _start_sql_log():
+        g.sql_log = []
+
+    @app.after_request
+    def _check_sql_log(response):
+        log = g.pop("sql_log", None)
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, "query_budget", False)
+        if log is None or budget is None:
+            return response
+        limit = app.config["SQL_QUERY_WARN"]
+        if budget is not False and request.method == "GET":
+            limit = budget
+        if len(log) <= limit:
+            return response
+        msg = "%s query di %s (batas %s):\n%s" % (
+            len(log),
+            request.endpoint,
+            limit,
+            "\n".join(stmt[:200] for stmt in log),
+        )
+        if app.config["SQL_QUERY_STRICT"]:
+            raise AssertionError(msg)
+        app.logger.warning(msg)
+        return response
+
+
+# ============================================================
+# Dev: profil cProfile per request (?profile=1)
+# ============================================================
+def _install_profiler(app: Flask, profile_dir: str) -> None:
+    """
+    PROFILE_DIR diisi -> request dengan ?profile=1 (GET atau action form POST)
+    dibungkus cProfile; file .prof disimpan di PROFILE_DIR dan 30 fungsi
+    teratas dicetak ke stdout. Buka pakai snakeviz / pstats untuk lihat
+    waktunya habis di ORM, Jinja, atau helper jurnal.
+    Request lain langsung ke app tanpa overhead.
+    """
+    from werkzeug.middleware.profiler import ProfilerMiddleware
+
+    os.makedirs(profile_dir, exist_ok=True)
+    plain = app.wsgi_app
+    profiled = ProfilerMiddleware(plain, restrictions=(30,), profile_dir=profile_dir)
+
+    def wsgi_app(environ, start_response):
+        if "profile=1" in environ.get("QUERY_STRING", "").split("&"):
+            return profiled(environ, start_response)
+        return plain(environ, start_response)
+
+    app.wsgi_app = wsgi_app
+
+
+# ============================================================
+# Tenant (Postgres Row-Level Security)
+# ============================================================
+_SET_TENANT_SQL = text("SELECT set_config('app.tenant_id', :tid, true)")
+_SET_BYPASS_SQL = text("SELECT set_config('app.bypass_rls', 'on', true)")
+
+
+def _apply_tenant(connection, tenant_id) -> None:
+    if tenant_id is None or connection.dialect.name != "postgresql":
+        return
+    connection.execute(_SET_TENANT_SQL, {"tid": str(tenant_id)})
+
+
+def _apply_bypass(connection) -> None:
+    if connection.dialect.name == "postgresql":
+        connection.execute(_SET_BYPASS_SQL)
+
+
+@event.listens_for(Session, "after_begin")
+def _tenant_after_begin(session, transaction, connection):
+    """
+    Setiap transaksi baru: SET LOCAL app.tenant_id = dapur yang sedang login,
+    supaya policy RLS di Postgres ikut menyaring baris per dapur.
+    """
+    if has_app_context():
+        if g.get("rls_bypass"):
+            _apply_bypass(connection)
+        _apply_tenant(connection, g.get("tenant_id"))
+
 
+def set_current_tenant(tenant_id: int | None) -> None:
+    """
+    Tandai dapur aktif untuk request ini (dipakai _after_begin di transaksi berikutnya)
+    dan langsung terapkan ke transaksi yang sedang berjalan.
+    """
+    g.tenant_id = tenant_id
+    if tenant_id is not None and db.session().in_transaction():
+        _apply_tenant(db.session.connection(), tenant_id)
+
+
+def bypass_tenant_rls() -> None:
+    """
+    Policy RLS fail-closed: tanpa app.tenant_id tidak ada baris yang lolos.
+    Entry point lintas dapur (admin, CLI) memanggil ini supaya transaksi
+    berikutnya (dan yang sedang jalan) SET LOCAL app.bypass_rls = on.
+    Request dapur biasa tidak pernah memanggilnya.
+    """
+    g.rls_bypass = True
+    if db.session().in_transaction():
+        _apply_bypass(db.session.connection())
+
+
+def _engine_options(url: str) -> dict:
+    """
+    Pool koneksi untuk Postgres (Railway): koneksi dipakai ulang antar request,
+    jadi tidak bayar connect/handshake tiap request & tidak mentok max_connections.
+    LIFO: koneksi yang baru dipakai diambil lagi, sisanya bisa di-recycle saat sepi.
+    DB_PGBOUNCER=1 (transaction mode): pooling diserahkan ke PgBouncer -> NullPool.
+    SQLite cukup pakai pool default (Flask-SQLAlchemy sudah pasang StaticPool
+    untuk :memory:).
+    query_cache_size: cache SQL hasil compile (LRU per engine). Key-nya bentuk
+    statement, bukan nilai parameter/tenant; default 500 mepet untuk semua
+    query list/laporan/rebuild + varian IN-nya, jadi dinaikkan supaya tidak evict.
+    """
+    cache = {"query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "2000"))}
+    if url and url.startswith("postgresql://"):
+        if os.getenv("DB_PGBOUNCER", "").lower() in ("1", "true", "yes"):
+            return {"poolclass": NullPool, **cache}
+        return {
+            **cache,
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            "pool_timeout": 30,
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True,
+        }
+    return cache
+
+
+# ============================================================
+# Migrasi saat startup (MIGRATION_MODE = skip | sync | async)
+# ============================================================
+# dibaca /healthz supaya kelihatan migrasi sudah jalan/selesai/gagal
+migration_state = {"mode": "skip", "status": "idle", "error": None}
+
+# kunci advisory Postgres (bigint bebas) yang dipegang selama upgrade startup
+_MIGRATION_LOCK_KEY = 0x62756B75
+
+
+@contextmanager
+def _migration_lock(url: str):
+    """
+    Postgres: pg_advisory_lock di koneksi sendiri (NullPool, dibuang setelahnya)
+    selama upgrade, jadi worker gunicorn lain menunggu, bukan balapan DDL yang
+    sama; begitu dapat giliran, upgrade() mereka tinggal no-op.
+    SQLite (lokal, satu proses): tanpa kunci.
+    """
+    if not url.startswith("postgresql"):
+        yield
+        return
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _MIGRATION_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _MIGRATION_LOCK_KEY})
+                conn.commit()
+    finally:
+        engine.dispose()
+
+
+def _run_migrations(app: Flask) -> None:
+    from flask_migrate import upgrade
+
+    migration_state["status"] = "running"
+    try:
+        # upgrade sendiri jalan di engine sekali pakai (migrations/env.py),
+        # bukan di pool engine app
+        with _migration_lock(app.config["SQLALCHEMY_DATABASE_URI"]), app.app_context():
+            upgrade()
+    except Exception as e:  # noqa: BLE001 - dilaporkan lewat /healthz
+        migration_state["status"] = "failed"
+        migration_state["error"] = str(e)
+        app.logger.exception("flask db upgrade gagal")
+    else:
+        migration_state["status"] = "done"
+
+
+def _start_migrations(app: Flask) -> None:
+    """
+    skip  : default, migrasi dijalankan manual (flask db upgrade)
+    sync  : upgrade dulu baru app melayani request
+    async : upgrade di thread background; sampai selesai /healthz 503 (belum siap)
+            dan request lain dijawab 503, bukan 500 karena skema belum lengkap
+    """
+    mode = os.getenv("MIGRATION_MODE", "skip").lower()
+    migration_state["mode"] = mode
+    if mode == "sync":
+        _run_migrations(app)
+    elif mode == "async":
+
+        @app.before_request
+        def _wait_for_migrations():
+            if migration_state["status"] != "done" and request.endpoint != "main.healthz":
+                return "Database sedang dimigrasi, coba lagi sebentar.", 503, {"Retry-After": "5"}
+
+        threading.Thread(
+            target=_run_migrations, args=(app,), name="db-upgrade", daemon=True
+        ).start()
+
+
+# ============================================================
+# Template: compile di startup, bukan di request pertama tiap worker
+# ============================================================
+def _warm_templates(app: Flask) -> None:
+    """
+    JINJA_CACHE_DIR diisi -> bytecode template disimpan di disk, worker gunicorn
+    yang baru (recycle/restart) tinggal load tanpa compile ulang.
+    Mode debug dilewati: template di-reload otomatis saat diedit.
+    """
+    if app.debug:
+        return
+    cache_dir = os.getenv("JINJA_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateError:
+            # jangan gagalkan boot; error-nya muncul lagi saat halaman dibuka
+            app.logger.exception("compile template %s gagal", name)
+
+
+# .env cukup dibaca sekali saat import; DATABASE_URL tetap dibaca di create_app()
+# supaya nilai yang diset setelah import (fixture test, wrapper CLI) ikut terpakai
+load_dotenv()
+
+
+def create_app():
     app = Flask(__name__)
 
     # Secret
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
 
     # Database (support Railway)
-    db_url = os.getenv("DATABASE_URL", "sqlite:///bukudapur.db")
-    app.config["SQLALCHEMY_DATABASE_URI"] = _fix_database_url(db_url)
+    db_url = _fix_database_url(os.getenv("DATABASE_URL", "sqlite:///bukudapur.db"))
+    app.config["SQLALCHEMY_DATABASE_URI"] = db_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options(db_url)
 
     # App settings
     app.config["ADMIN_PIN"] = os.getenv("ADMIN_PIN", "123456")
+    app.config["SQL_QUERY_WARN"] = int(os.getenv("SQL_QUERY_WARN", "20"))
+    app.config["SQL_QUERY_STRICT"] = os.getenv("SQL_QUERY_STRICT", "").lower() in ("1", "true", "yes")
 
     # Init extensions
     db.init_app(app)
@@ -44,4 +354,15 @@ def create_app():
     from .routes import bp
     app.register_blueprint(bp)
 
+    if app.debug or app.config["SQL_QUERY_STRICT"]:
+        _install_query_counter(app)
+
+    profile_dir = os.getenv("PROFILE_DIR")
+    if profile_dir:
+        _install_profiler(app, profile_dir)
+
+    _warm_templates(app)
+
+    _start_migrations(app)
+
     return app
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from datetime import datetime
 
 candidates = [
     "bukudapur.db",
@@ -8,7 +9,7 @@ candidates = [
 
 db_path = None
 for c in candidates:
-    if os.path.exists(c):
+    if os.path.isfile(c):
         db_path = c
         break
 
@@ -17,25 +18,60 @@ if not db_path:
 
 print("DB dipakai:", db_path)
 
-conn = sqlite3.connect(db_path)
+BATCH_SIZE = 1000
+
+# daftar DISTINCT type = full scan tabel, cuma untuk log -> hanya kalau diminta
+VERBOSE = bool(os.environ.get("FIX_VERBOSE"))
+
+# mode=rw: file sudah dicek di atas, jangan sampai bikin DB kosong baru.
+# isolation_level=None: autocommit, tiap UPDATE batch langsung commit sendiri
+conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True, isolation_level=None)
 cur = conn.cursor()
 
+# WAL: pembaca tidak diblok selama UPDATE berjalan
+cur.execute("PRAGMA journal_mode=WAL")
+cur.execute("PRAGMA synchronous=NORMAL")
+
 cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='accounts'")
 print("Table accounts ada?", cur.fetchone())
 
-cur.execute("SELECT DISTINCT type FROM accounts ORDER BY type")
-print("Types sebelum:", [r[0] for r in cur.fetchall()])
+if VERBOSE:
+    cur.execute("SELECT DISTINCT type FROM accounts ORDER BY type")
+    print("Types sebelum:", [r[0] for r in cur.fetchall()])
+
+# updated_at format SQLAlchemy (mikrodetik): versi cache COA di app ikut berubah
+now = datetime.utcnow().isoformat(" ")
+
+# salah ketik yang dibetulkan, termasuk variasi spasi di depan/belakang.
+# IN nilai persis (bukan TRIM(type)=...) tanpa index sementara: tiap batch cuma
+# memeriksa rentang rowid-nya sendiri, jadi total hanya satu kali lewat tabel
+TYPE_TYPOS = ("Pendapatn Lain", " Pendapatn Lain", "Pendapatn Lain ", " Pendapatn Lain ")
+
+cur.execute("SELECT COALESCE(MAX(rowid), 0) FROM accounts")
+max_rowid = cur.fetchone()[0]
+
+# UPDATE per batch rentang rowid (commit tiap batch) supaya lock tabel tidak lama
+updated = 0
+for start in range(0, max_rowid, BATCH_SIZE):
+    with conn:
+        updated += cur.execute(
+            f"""
+            UPDATE accounts
+            SET type='Pendapatan Lain', updated_at=?
+            WHERE rowid > ? AND rowid <= ?
+              AND type IN ({", ".join("?" * len(TYPE_TYPOS))})
+            """,
+            (now, start, start + BATCH_SIZE, *TYPE_TYPOS),
+        ).rowcount
 
-cur.execute("""
-UPDATE accounts
-SET type='Pendapatan Lain'
-WHERE TRIM(type)='Pendapatn Lain'
-""")
-conn.commit()
+print("Rows updated:", updated)
 
-print("Rows updated:", conn.total_changes)
+if VERBOSE:
+    cur.execute("SELECT DISTINCT type FROM accounts ORDER BY type")
+    print("Types sesudah:", [r[0] for r in cur.fetchall()])
 
-cur.execute("SELECT DISTINCT type FROM accounts ORDER BY type")
-print("Types sesudah:", [r[0] for r in cur.fetchall()])
+# statistik planner diperbarui setelah data berubah, WAL dikosongkan
+cur.execute("PRAGMA optimize")
+cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
 conn.close()
@@ -1,9 +1,76 @@
 from __future__ import annotations
 
 from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import declared_attr, raiseload, selectinload
+
 from . import db
 
 
+# ============================================================
+# TYPES
+# ============================================================
+class CodedString(db.TypeDecorator):
+    """
+    Kolom string dengan pilihan tetap, disimpan sebagai SMALLINT
+    (kode = urutan di `values`). Di Python & template tetap string.
+    """
+
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def __init__(self, values: tuple[str, ...]):
+        super().__init__()
+        self.values = tuple(values)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self.values.index(value)
+        except ValueError:
+            raise ValueError(f"Nilai {value!r} tidak valid, pilihan: {', '.join(self.values)}")
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.values[int(value)]
+
+
+ACCESS_STATUSES = ("trial", "active", "expired")
+CASH_DIRECTIONS = ("in", "out")
+CASH_KINDS = ("cash", "sale")
+INVOICE_STATUSES = ("unpaid", "partial", "paid")
+JOURNAL_SOURCES = (
+    "manual",
+    "cash",
+    "purchase",
+    "ap_payment",
+    "stock_usage",
+    "sales_invoice",
+    "ar_payment",
+)
+
+
+def coded_check(column: str, values: tuple[str, ...], name: str) -> db.CheckConstraint:
+    """CHECK di DB: kode SMALLINT harus salah satu index dari values."""
+    return db.CheckConstraint(f"{column} BETWEEN 0 AND {len(values) - 1}", name=name)
+
+
+class TenantScoped:
+    """
+    Mixin semua tabel milik satu dapur: kolom access_code_id (FK ke access_codes).
+    Cek "model ini di-scope?" cukup isinstance/issubclass, tanpa hasattr.
+    """
+
+    @declared_attr
+    def access_code_id(cls):
+        return db.Column(
+            db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
+        )
+
+
 # ============================================================
 # ACCESS / TENANT
 # ============================================================
@@ -19,25 +86,33 @@ class AccessCode(db.Model):
     dapur_name = db.Column(db.String(120), nullable=True)
 
     # trial / active / expired
-    status = db.Column(db.String(16), nullable=False, default="trial")
+    status = db.Column(CodedString(ACCESS_STATUSES), nullable=False, default="trial")
 
     # Masa berlaku
     start_at = db.Column(db.DateTime, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
 
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    __table_args__ = (
+        coded_check("status", ACCESS_STATUSES, "ck_access_codes_status"),
+        # kode selalu disimpan UPPERCASE (input di-.upper()), jadi lookup
+        # filter_by(code=...) tetap pakai unique index biasa, tanpa upper(code)
+        db.CheckConstraint("code = upper(code)", name="ck_access_codes_code_upper"),
+    )
 
     # Relationships (opsional, tapi membantu)
-    accounts = db.relationship("Account", backref="access", lazy=True)
-    suppliers = db.relationship("Supplier", backref="access", lazy=True)
-    items = db.relationship("Item", backref="access", lazy=True)
+    accounts = db.relationship("Account", back_populates="access", lazy=True)
+    suppliers = db.relationship("Supplier", back_populates="access", lazy=True)
+    items = db.relationship("Item", back_populates="access", lazy=True)
 
     def is_expired(self) -> bool:
         return datetime.utcnow() > self.expires_at
 
     def mark_expired_if_needed(self) -> bool:
         """Return True jika status berubah jadi expired."""
-        if self.is_expired() and self.status != "expired":
+        # cek status dulu: kode yang sudah expired tidak perlu baca jam lagi
+        if self.status != "expired" and self.is_expired():
             self.status = "expired"
             return True
         return False
@@ -46,15 +121,11 @@ class AccessCode(db.Model):
 # ============================================================
 # MASTER DATA (per dapur)
 # ============================================================
-class Account(db.Model):
+class Account(TenantScoped, db.Model):
     __tablename__ = "accounts"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     # contoh: 1010, 5010
     code = db.Column(db.String(10), nullable=False, index=True)
     name = db.Column(db.String(120), nullable=False)
@@ -64,58 +135,62 @@ class Account(db.Model):
     # "HPP", "Beban", "Beban Lain", dll
     type = db.Column(db.String(30), nullable=False)
 
-    is_active = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    is_active = db.Column(db.Boolean, server_default=db.true(), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    # diisi tiap UPDATE (rename/ubah tipe); ikut versi cache COA di routes
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.utcnow)
+
+    access = db.relationship("AccessCode", back_populates="accounts")
 
     __table_args__ = (
         db.UniqueConstraint("access_code_id", "code", name="uq_accounts_tenant_code"),
+        db.Index("ix_accounts_tenant_updated", "access_code_id", "updated_at"),
     )
 
 
-class Supplier(db.Model):
+class Supplier(TenantScoped, db.Model):
     __tablename__ = "suppliers"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     name = db.Column(db.String(120), nullable=False, index=True)
     phone = db.Column(db.String(40), nullable=True)
     address = db.Column(db.String(255), nullable=True)
 
-    is_active = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    is_active = db.Column(db.Boolean, server_default=db.true(), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    # diisi tiap UPDATE; ikut versi cache dropdown supplier di routes
+    updated_at = db.Column(db.DateTime, nullable=True, onupdate=datetime.utcnow)
+
+    access = db.relationship("AccessCode", back_populates="suppliers")
 
     __table_args__ = (
         db.UniqueConstraint("access_code_id", "name", name="uq_suppliers_tenant_name"),
+        db.Index("ix_suppliers_tenant_updated", "access_code_id", "updated_at"),
     )
 
 
-class Item(db.Model):
+class Item(TenantScoped, db.Model):
     __tablename__ = "items"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     name = db.Column(db.String(120), nullable=False, index=True)
     category = db.Column(db.String(80), nullable=True)
 
     # contoh: kg, liter, pcs
     unit = db.Column(db.String(20), nullable=False, default="pcs")
 
-    min_stock = db.Column(db.Float, nullable=False, default=0)
+    min_stock = db.Column(db.Numeric(14, 3), nullable=False, default=0)
 
     # stok & nilai sederhana untuk MVP
-    stock_qty = db.Column(db.Float, nullable=False, default=0)
-    avg_cost = db.Column(db.Float, nullable=False, default=0)
+    stock_qty = db.Column(db.Numeric(14, 3), nullable=False, default=0)
+    avg_cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    is_active = db.Column(db.Boolean, server_default=db.true(), nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
 
-    is_active = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    access = db.relationship("AccessCode", back_populates="items")
 
     __table_args__ = (
         db.UniqueConstraint("access_code_id", "name", name="uq_items_tenant_name"),
@@ -125,66 +200,95 @@ class Item(db.Model):
 # ============================================================
 # JOURNAL
 # ============================================================
-class JournalEntry(db.Model):
+class JournalEntry(TenantScoped, db.Model):
     __tablename__ = "journal_entries"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
     memo = db.Column(db.String(255), nullable=True)
 
     # sumber transaksi (kas/pembelian/pemakaian), untuk tracking MVP
-    source = db.Column(db.String(30), nullable=False, default="manual")
+    source = db.Column(CodedString(JOURNAL_SOURCES), nullable=False, default="manual")
     source_id = db.Column(db.Integer, nullable=True)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    # diisi saat entry ditulis ulang di tempat (edit dokumen); kosong = belum pernah
+    updated_at = db.Column(db.DateTime, nullable=True)
 
     lines = db.relationship(
-        "JournalLine", backref="entry", cascade="all, delete-orphan", lazy=True
+        "JournalLine",
+        back_populates="entry",
+        cascade="all, delete-orphan",
+        passive_deletes=True,  # lines dihapus DB lewat ON DELETE CASCADE
+        lazy="selectin",
+        order_by="JournalLine.id",
+    )
+
+    __table_args__ = (
+        db.Index("ix_journal_entries_tenant_date", "access_code_id", "date", "id"),
+        db.Index("ix_journal_entries_tenant_updated", "access_code_id", "updated_at"),
+        coded_check("source", JOURNAL_SOURCES, "ck_journal_entries_source"),
     )
 
 
-class JournalLine(db.Model):
+class JournalLine(TenantScoped, db.Model):
     __tablename__ = "journal_lines"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
+    entry_id = db.Column(
+        db.Integer,
+        db.ForeignKey("journal_entries.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
 
-    entry_id = db.Column(db.Integer, db.ForeignKey("journal_entries.id"), nullable=False)
-
     account_code = db.Column(db.String(10), nullable=False, index=True)
     account_name = db.Column(db.String(120), nullable=False)
 
-    debit = db.Column(db.Float, nullable=False, default=0)
-    credit = db.Column(db.Float, nullable=False, default=0)
+    debit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    credit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    entry = db.relationship("JournalEntry", back_populates="lines")
 
     __table_args__ = (
         db.Index("ix_journal_lines_tenant_account", "access_code_id", "account_code"),
     )
 
+    @classmethod
+    def bulk_create(cls, session, access_code_id: int, entry_id: int, rows) -> None:
+        """
+        Insert semua baris jurnal satu entry dalam satu INSERT multi-row.
+        rows: dict berisi account_code, account_name, debit, credit.
+        """
+        cls.bulk_create_many(session, access_code_id, [(entry_id, rows)])
+
+    @classmethod
+    def bulk_create_many(cls, session, access_code_id: int, batches) -> None:
+        """Seperti bulk_create untuk banyak entry: batches = [(entry_id, rows), ...]."""
+        mappings = [
+            dict(r, access_code_id=access_code_id, entry_id=entry_id)
+            for entry_id, rows in batches
+            for r in rows
+        ]
+        if mappings:
+            session.execute(insert(cls), mappings)
+
 
 # ============================================================
 # CASH TRANSACTION
 # ============================================================
-class CashTransaction(db.Model):
+class CashTransaction(TenantScoped, db.Model):
     __tablename__ = "cash_transactions"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
     # in / out
-    direction = db.Column(db.String(5), nullable=False)
+    direction = db.Column(CodedString(CASH_DIRECTIONS), nullable=False)
+    # sumber input: menu Penjualan = sale, lainnya cash (dulu dibedakan dari memo "[SALE]%")
+    kind = db.Column(CodedString(CASH_KINDS), nullable=False, default="cash", server_default="0")
 
     cash_account_code = db.Column(db.String(10), nullable=False)  # Kas / Bank
     cash_account_name = db.Column(db.String(120), nullable=False)
@@ -192,34 +296,38 @@ class CashTransaction(db.Model):
     counter_account_code = db.Column(db.String(10), nullable=False)  # lawan transaksi
     counter_account_name = db.Column(db.String(120), nullable=False)
 
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
     memo = db.Column(db.String(255), nullable=True)
 
     journal_entry_id = db.Column(
         db.Integer, db.ForeignKey("journal_entries.id"), nullable=True
     )
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_cash_transactions_tenant_date_direction", "access_code_id", "date", "direction"),
+        db.Index("ix_cash_transactions_tenant_date", "access_code_id", "date", "id"),
+        db.Index("ix_cash_transactions_tenant_kind_date", "access_code_id", "kind", "date", "id"),
+        coded_check("direction", CASH_DIRECTIONS, "ck_cash_transactions_direction"),
+        coded_check("kind", CASH_KINDS, "ck_cash_transactions_kind"),
+    )
 
 
 # ============================================================
 # PURCHASE + AP PAYMENT
 # ============================================================
-class Purchase(db.Model):
+class Purchase(TenantScoped, db.Model):
     __tablename__ = "purchases"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
 
     supplier_id = db.Column(db.Integer, db.ForeignKey("suppliers.id"), nullable=True)
     supplier_name = db.Column(db.String(120), nullable=True)
 
-    total_amount = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False)
     is_paid = db.Column(db.Boolean, default=False, nullable=False)
 
     journal_entry_id = db.Column(
@@ -227,41 +335,51 @@ class Purchase(db.Model):
     )
 
     memo = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
 
     items = db.relationship(
-        "PurchaseItem", backref="purchase", cascade="all, delete-orphan", lazy=True
+        "PurchaseItem",
+        back_populates="purchase",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+        order_by="PurchaseItem.id",
+    )
+
+    __table_args__ = (
+        db.Index("ix_purchases_tenant_paid_date", "access_code_id", "is_paid", "date"),
+        # riwayat: WHERE access_code_id ORDER BY date DESC, id DESC (backward index scan)
+        db.Index("ix_purchases_tenant_date", "access_code_id", "date", "id"),
     )
 
 
-class PurchaseItem(db.Model):
+class PurchaseItem(TenantScoped, db.Model):
     __tablename__ = "purchase_items"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
+    purchase_id = db.Column(
+        db.Integer, db.ForeignKey("purchases.id"), nullable=False, index=True
     )
 
-    purchase_id = db.Column(db.Integer, db.ForeignKey("purchases.id"), nullable=False)
-
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
-    item_name = db.Column(db.String(120), nullable=False)
 
-    qty = db.Column(db.Float, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    subtotal = db.Column(db.Float, nullable=False)
+    qty = db.Column(db.Numeric(14, 3), nullable=False)
+    price = db.Column(db.Numeric(14, 2), nullable=False)
+    subtotal = db.Column(db.Numeric(14, 2), nullable=False)
+
+    purchase = db.relationship("Purchase", back_populates="items")
+    item = db.relationship("Item")
+
+    @property
+    def item_name(self) -> str | None:
+        return self.item.name if self.item else None
 
 
-class APayment(db.Model):
+class APayment(TenantScoped, db.Model):
     __tablename__ = "ap_payments"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
 
     purchase_id = db.Column(db.Integer, db.ForeignKey("purchases.id"), nullable=True)
@@ -270,27 +388,27 @@ class APayment(db.Model):
     cash_account_code = db.Column(db.String(10), nullable=False)
     cash_account_name = db.Column(db.String(120), nullable=False)
 
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
     memo = db.Column(db.String(255), nullable=True)
 
     journal_entry_id = db.Column(
         db.Integer, db.ForeignKey("journal_entries.id"), nullable=True
     )
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_ap_payments_tenant_date", "access_code_id", "date", "id"),
+    )
 
 
 # ============================================================
 # SALES INVOICE + AR PAYMENT
 # ============================================================
-class SalesInvoice(db.Model):
+class SalesInvoice(TenantScoped, db.Model):
     __tablename__ = "sales_invoices"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
 
     # invoice no harus unik per dapur (bukan global)
@@ -306,88 +424,96 @@ class SalesInvoice(db.Model):
     revenue_account_code = db.Column(db.String(20), nullable=False)  # Pendapatan
     revenue_account_name = db.Column(db.String(120), nullable=False)
 
-    total_amount = db.Column(db.Float, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
 
-    status = db.Column(db.String(20), nullable=False, default="unpaid")  # unpaid/partial/paid
-    paid_amount = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(CodedString(INVOICE_STATUSES), nullable=False, default="unpaid")
+    paid_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
 
     journal_entry_id = db.Column(db.Integer, db.ForeignKey("journal_entries.id"))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    lines = db.relationship(
+        "SalesInvoiceLine",
+        back_populates="invoice",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+        order_by="SalesInvoiceLine.id",
+    )
 
     __table_args__ = (
         db.UniqueConstraint(
             "access_code_id", "invoice_no", name="uq_sales_invoices_tenant_invoice_no"
         ),
+        db.Index("ix_sales_invoices_tenant_status_date", "access_code_id", "status", "date"),
+        db.Index("ix_sales_invoices_tenant_date", "access_code_id", "date", "id"),
+        coded_check("status", INVOICE_STATUSES, "ck_sales_invoices_status"),
     )
 
 
-class SalesInvoiceLine(db.Model):
+class SalesInvoiceLine(TenantScoped, db.Model):
     __tablename__ = "sales_invoice_lines"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
+    invoice_id = db.Column(
+        db.Integer, db.ForeignKey("sales_invoices.id"), nullable=False, index=True
     )
 
-    invoice_id = db.Column(db.Integer, db.ForeignKey("sales_invoices.id"), nullable=False)
-
     description = db.Column(db.String(200), nullable=False)
-    qty = db.Column(db.Float, nullable=False, default=1)
+    qty = db.Column(db.Numeric(14, 3), nullable=False, default=1)
     unit = db.Column(db.String(30))
-    price = db.Column(db.Float, nullable=False, default=0)
-    amount = db.Column(db.Float, nullable=False, default=0)
+    price = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
 
-    invoice = db.relationship(
-        "SalesInvoice",
-        backref=db.backref("lines", lazy=True, cascade="all, delete-orphan"),
-    )
+    invoice = db.relationship("SalesInvoice", back_populates="lines")
 
 
-class ARPayment(db.Model):
+class ARPayment(TenantScoped, db.Model):
     __tablename__ = "ar_payments"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
 
-    invoice_id = db.Column(db.Integer, db.ForeignKey("sales_invoices.id"), nullable=False)
-    invoice_no = db.Column(db.String(50), nullable=False)
+    invoice_id = db.Column(
+        db.Integer, db.ForeignKey("sales_invoices.id"), nullable=False, index=True
+    )
 
     cash_account_code = db.Column(db.String(20), nullable=False)
     cash_account_name = db.Column(db.String(120), nullable=False)
 
-    amount = db.Column(db.Float, nullable=False, default=0)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
     memo = db.Column(db.String(255))
 
     journal_entry_id = db.Column(db.Integer, db.ForeignKey("journal_entries.id"))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    invoice = db.relationship("SalesInvoice")
+
+    __table_args__ = (
+        db.Index("ix_ar_payments_tenant_date", "access_code_id", "date", "id"),
+    )
+
+    @property
+    def invoice_no(self) -> str | None:
+        return self.invoice.invoice_no if self.invoice else None
 
 
 # ============================================================
 # STOCK USAGE (HPP)
 # ============================================================
-class StockUsage(db.Model):
+class StockUsage(TenantScoped, db.Model):
     __tablename__ = "stock_usages"
 
     id = db.Column(db.Integer, primary_key=True)
 
-    access_code_id = db.Column(
-        db.Integer, db.ForeignKey("access_codes.id"), nullable=False, index=True
-    )
-
     date = db.Column(db.DateTime, nullable=False)
 
     item_id = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
-    item_name = db.Column(db.String(120), nullable=False)
 
-    qty = db.Column(db.Float, nullable=False)
-    unit_cost = db.Column(db.Float, nullable=False)
-    total_cost = db.Column(db.Float, nullable=False)
+    qty = db.Column(db.Numeric(14, 3), nullable=False)
+    unit_cost = db.Column(db.Numeric(14, 2), nullable=False)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False)
 
     hpp_account_code = db.Column(db.String(10), nullable=False)
     hpp_account_name = db.Column(db.String(120), nullable=False)
@@ -397,4 +523,32 @@ class StockUsage(db.Model):
     journal_entry_id = db.Column(
         db.Integer, db.ForeignKey("journal_entries.id"), nullable=True
     )
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    item = db.relationship("Item")
+
+    __table_args__ = (
+        db.Index("ix_stock_usages_tenant_item_date", "access_code_id", "item_id", "date"),
+        db.Index("ix_stock_usages_tenant_date", "access_code_id", "date", "id"),
+    )
+
+    @property
+    def item_name(self) -> str | None:
+        return self.item.name if self.item else None
+
+
+# ============================================================
+# QUERY HELPERS
+# ============================================================
+def list_query(model, *eager):
+    """
+    Query untuk halaman list: relasi yang dibutuhkan template di-eager-load
+    (selectin) di `eager`, relasi lain raise kalau disentuh (cegah N+1 diam-diam).
+
+        list_query(JournalEntry).filter_by(access_code_id=acc.id)...
+        list_query(JournalEntry, JournalEntry.lines)...
+    """
+    return db.session.query(model).options(
+        *[selectinload(rel) for rel in eager],
+        raiseload("*"),
+    )
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+from decimal import Decimal
 from io import BytesIO
-from typing import Any, List, Optional, Sequence
+import tempfile
+from typing import Any, Iterable, List, Optional, Sequence
 
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_RIGHT
@@ -9,6 +11,7 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import mm
 from reportlab.platypus import (
+    Flowable,
     SimpleDocTemplate,
     Paragraph,
     Spacer,
@@ -66,12 +69,26 @@ STYLE_CELL_MUTED = ParagraphStyle(
     textColor=colors.HexColor("#6b7280"),
 )
 
+# ParagraphStyle per font_size, dibuat sekali lalu dipakai ulang semua cell
+_CELL_STYLE_CACHE: dict[int, ParagraphStyle] = {}
+# batas panjang cell yang aman dirender string biasa (tidak perlu wrap)
+_PLAIN_CELL_MAX = 32
+
 GRID_COLOR = colors.HexColor("#e5e7eb")
 HEADER_BG = colors.HexColor("#f3f4f6")
 HEADER_LINE = colors.HexColor("#d1d5db")
+HEADER_TEXT = colors.HexColor("#111827")
 
 
 def fmt_idr(x: Any) -> str:
+    # jalur cepat per tipe (dipanggil per cell laporan), sisanya lewat float()
+    if x is None:
+        return "Rp 0"
+    t = type(x)
+    if t is int:
+        return f"Rp {x:,d}"
+    if t is float or t is Decimal:
+        return f"Rp {x:,.0f}"
     try:
         return f"Rp {float(x or 0):,.0f}"
     except Exception:
@@ -88,6 +105,8 @@ def pdf_doc(
     bottomMargin=36,
     onFirstPage=None,
     onLaterPages=None,
+    as_buffer: bool = False,
+    spool_max: int | None = None,
 ):
     """
     Mode A (DocTemplate):
@@ -96,11 +115,22 @@ def pdf_doc(
 
     Mode B (bytes):
         pdf_bytes = pdf_doc(story)
+
+    Mode B + as_buffer=True: BytesIO (posisi 0), langsung untuk
+        send_file(buf, mimetype="application/pdf") tanpa salin ke bytes dulu.
+
+    Mode C (spool_max=...): seperti as_buffer, tapi pakai
+        SpooledTemporaryFile -> PDF besar (ratusan halaman) pindah ke disk
+        setelah spool_max byte, jadi RSS tidak melonjak. Kirim dengan
+        send_file(buf, mimetype="application/pdf", download_name=..., max_age=0).
     """
     # Mode B: arg adalah story
     if isinstance(arg, (list, tuple)):
         story = list(arg)
-        buf = BytesIO()
+        if spool_max is not None:
+            buf = tempfile.SpooledTemporaryFile(max_size=spool_max, mode="w+b")
+        else:
+            buf = BytesIO()
         doc = SimpleDocTemplate(
             buf,
             pagesize=pagesize,
@@ -109,7 +139,14 @@ def pdf_doc(
             topMargin=topMargin,
             bottomMargin=bottomMargin,
         )
-        doc.build(story, onFirstPage=onFirstPage, onLaterPages=onLaterPages)
+        doc.build(
+            story,
+            onFirstPage=onFirstPage or _noop_footer,
+            onLaterPages=onLaterPages or _noop_footer,
+        )
+        if as_buffer or spool_max is not None:
+            buf.seek(0)
+            return buf
         return buf.getvalue()
 
     # Mode A: arg adalah path
@@ -124,6 +161,33 @@ def pdf_doc(
     )
 
 
+# style baris atas header: sama untuk semua PDF, cukup dibuat sekali (read-only)
+_STATIC_HEADER_STYLE = TableStyle([
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
+    ("TOPPADDING", (0, 0), (-1, -1), 0),
+    ("LEFTPADDING", (0, 0), (-1, -1), 0),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+])
+
+
+def _static_header(dapur_name: str, right_text: str) -> Table:
+    """
+    Baris atas header (nama dapur | nama aplikasi). Table & Paragraph selalu baru:
+    flowable ReportLab menyimpan state wrap/split, jadi tidak boleh dibagi antar
+    PDF yang dibangun bersamaan (worker threaded). Yang dipakai ulang cuma style.
+    """
+    t = Table(
+        [[
+            Paragraph(f"<b>{dapur_name}</b>", STYLE_META_L),
+            Paragraph(f"<b>{right_text}</b>", STYLE_META_R),
+        ]],
+        colWidths=[None, 55 * mm],
+    )
+    t.setStyle(_STATIC_HEADER_STYLE)
+    return t
+
+
 def header_block(
     story: List[Any],
     title: str,
@@ -135,22 +199,7 @@ def header_block(
     """
     Append header ke story (bukan return list).
     """
-    # top row
-    t = Table(
-        [[
-            Paragraph(f"<b>{dapur_name}</b>", STYLE_META_L),
-            Paragraph(f"<b>{right_text}</b>", STYLE_META_R),
-        ]],
-        colWidths=[None, 55 * mm],
-    )
-    t.setStyle(TableStyle([
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 2),
-        ("TOPPADDING", (0, 0), (-1, -1), 0),
-        ("LEFTPADDING", (0, 0), (-1, -1), 0),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 0),
-    ]))
-    story.append(t)
+    story.append(_static_header(dapur_name, right_text))
 
     story.append(Paragraph(title, STYLE_TITLE))
     if subtitle:
@@ -171,23 +220,44 @@ def subsection_title(story: List[Any], text: str):
 
 
 def _cell(v: Any, font_size: int) -> Any:
-    if isinstance(v, Paragraph):
+    if isinstance(v, Flowable):
         return v
-    if v is None:
-        v = ""
-    return Paragraph(
-        str(v),
-        ParagraphStyle(
-            "BD_CellDynamic",
+    s = "" if v is None else str(v)
+    # teks polos pendek (angka, tanggal, kode) langsung string: tanpa parser Paragraph.
+    # markup / entity atau teks panjang (perlu wrap) tetap lewat Paragraph
+    if len(s) <= _PLAIN_CELL_MAX and "<" not in s and "&" not in s:
+        return s
+    style = _CELL_STYLE_CACHE.get(font_size)
+    if style is None:
+        style = ParagraphStyle(
+            f"BD_Cell_{font_size}",
             parent=STYLE_CELL,
             fontSize=font_size,
             leading=font_size + 3,
-        ),
-    )
+        )
+        _CELL_STYLE_CACHE[font_size] = style
+    return Paragraph(s, style)
+
+
+def _row_cells(row: Sequence[Any], font_size: int) -> list:
+    """
+    Salinan dangkal row; cuma cell yang belum siap yang lewat _cell.
+    Row berisi string pendek polos / flowable (kasus umum laporan) tidak
+    membuat Paragraph atau string baru sama sekali.
+    """
+    out = list(row)
+    for j, v in enumerate(out):
+        if type(v) is str:
+            if len(v) <= _PLAIN_CELL_MAX and "<" not in v and "&" not in v:
+                continue
+        elif isinstance(v, Flowable):
+            continue
+        out[j] = _cell(v, font_size)
+    return out
 
 
 def table_block(
-    rows: Sequence[Sequence[Any]],
+    rows: Iterable[Sequence[Any]],
     col_widths: Optional[Sequence[float]] = None,
     header_rows: int = 1,
     font_size: int = 9,
@@ -196,13 +266,24 @@ def table_block(
 ) -> List[Any]:
     """
     Return list flowables supaya bisa: story += table_block(...)
+    rows boleh iterable apa saja (generator, hasil query) — dibaca sekali, tanpa list() dulu.
+    Kalau panjangnya diketahui, matriks dialokasi sekali lalu diisi per index.
     """
-    data = [[_cell(v, font_size) for v in row] for row in rows]
+    if hasattr(rows, "__len__"):
+        data = [None] * len(rows)
+        for i, row in enumerate(rows):
+            data[i] = _row_cells(row, font_size)
+    else:
+        data = [_row_cells(row, font_size) for row in rows]
 
     tbl = Table(data, colWidths=col_widths, rowHeights=row_heights, hAlign="LEFT")
 
     style_cmds = [
         ("GRID", (0, 0), (-1, -1), 0.25, GRID_COLOR),
+        # font untuk cell string biasa (cell Paragraph pakai style sendiri)
+        ("FONTNAME", (0, 0), (-1, -1), STYLE_CELL.fontName),
+        ("FONTSIZE", (0, 0), (-1, -1), font_size),
+        ("LEADING", (0, 0), (-1, -1), font_size + 3),
         ("VALIGN", (0, 0), (-1, -1), "TOP"),
         ("LEFTPADDING", (0, 0), (-1, -1), 6),
         ("RIGHTPADDING", (0, 0), (-1, -1), 6),
@@ -213,7 +294,7 @@ def table_block(
     if header_rows and header_rows > 0:
         style_cmds += [
             ("BACKGROUND", (0, 0), (-1, header_rows - 1), HEADER_BG),
-            ("TEXTCOLOR", (0, 0), (-1, header_rows - 1), colors.HexColor("#111827")),
+            ("TEXTCOLOR", (0, 0), (-1, header_rows - 1), HEADER_TEXT),
             ("LINEBELOW", (0, header_rows - 1), (-1, header_rows - 1), 0.8, HEADER_LINE),
         ]
 
@@ -244,11 +325,14 @@ def table_3col(rows, col_widths=None, header: bool = True, font_size: int = 9, a
     return flow[0]
 
 
+def _noop_footer(canvas, doc):
+    # no-op footer (aman)
+    return
+
+
 def footer_canvas():
     """
     Return callback function untuk doc.build(onFirstPage=..., onLaterPages=...)
+    (satu fungsi yang sama dipakai ulang, tidak bikin closure baru tiap PDF)
     """
-    def _cb(canvas, doc):
-        # no-op footer (aman)
-        return
-    return _cb
+    return _noop_footer
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta, date
-from io import BytesIO
+import math
 import secrets
 import tempfile
 
 from flask import (
     Blueprint,
+    abort,
     current_app,
     flash,
+    g,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -17,13 +22,21 @@ from flask import (
     url_for,
 )
 
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
-from openpyxl.utils import get_column_letter
-
-from sqlalchemy import func
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    inspect as sa_inspect,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.orm import lazyload, selectinload
 
-from . import db
+from . import bypass_tenant_rls, db, migration_state, query_budget, set_current_tenant
 from .models import (
     # Access
     AccessCode,
@@ -45,17 +58,11 @@ from .models import (
     APayment,
     # Stock usage
     StockUsage,
-)
-from .pdf_utils import (
-    pdf_doc,
-    header_block,
-    table_2col,
-    table_3col,
-    table_block,
-    fmt_idr,
-    footer_canvas,
-    section_title,
-    subsection_title,
+    # Query helpers
+    TenantScoped,
+    list_query,
+    # Kode
+    CASH_DIRECTIONS,
 )
 
 # =========================
@@ -114,6 +121,17 @@ def export_balance_sheet_pdf():
     return redirect(url_for("main.report_balance_sheet"))
 
 
+# =========================
+# Health check (Railway)
+# =========================
+@bp.get("/healthz")
+def healthz():
+    # gagal -> 503; mode async: belum siap (503) sampai skema selesai dimigrasi
+    ready = migration_state["mode"] != "async" or migration_state["status"] == "done"
+    code = 200 if ready and migration_state["status"] != "failed" else 503
+    return jsonify(status="ok" if code == 200 else "error", migration=migration_state), code
+
+
 # =========================
 # Session Keys
 # =========================
@@ -132,6 +150,8 @@ def _require_admin():
     if not _admin_logged_in():
         flash("Silakan login admin dulu.", "error")
         return redirect(url_for("main.admin_login"))
+    # admin lintas dapur: lewati policy RLS (lihat bypass_tenant_rls)
+    bypass_tenant_rls()
     return None
 
 
@@ -147,17 +167,22 @@ def _get_active_access():
     if not code:
         return None
 
-    acc = AccessCode.query.filter_by(code=code).first()
-    if not acc:
-        return None
-
-    changed = acc.mark_expired_if_needed()
-    if changed:
-        db.session.commit()
+    # sudah di-resolve di request ini (dashboard/route bisa memanggil berkali-kali);
+    # hasil None (kode tidak ada / expired) ikut di-memo
+    cached = g.get("_access_code")
+    if cached is not None and cached[0] == code:
+        return cached[1]
 
-    if acc.status == "expired":
-        return None
+    acc = db.session.scalar(select(AccessCode).filter_by(code=code).limit(1))
+    if acc is not None:
+        if acc.mark_expired_if_needed():
+            db.session.commit()
+        if acc.status == "expired":
+            acc = None
+        else:
+            set_current_tenant(acc.id)
 
+    g._access_code = (code, acc)
     return acc
 
 
@@ -168,8 +193,9 @@ def _require_access():
 # ============================================================
 # Helper: Tenant scope (per kode akses)
 # ============================================================
-def _has_col(model_or_alias, col_name: str) -> bool:
-    return hasattr(model_or_alias, col_name)
+def _is_scoped(model_or_alias) -> bool:
+    # inspect() jalan untuk class model maupun aliased(...)
+    return issubclass(sa_inspect(model_or_alias).class_, TenantScoped)
 
 
 def _scope_filter_for_model(model_or_alias, acc: AccessCode):
@@ -179,8 +205,8 @@ def _scope_filter_for_model(model_or_alias, acc: AccessCode):
     """
     if not acc:
         return None
-    if _has_col(model_or_alias, "access_code_id"):
-        return getattr(model_or_alias, "access_code_id") == acc.id
+    if _is_scoped(model_or_alias):
+        return model_or_alias.access_code_id == acc.id
     return None
 
 
@@ -201,16 +227,86 @@ def _apply_scope(query, acc: AccessCode, *models_or_aliases):
 # ============================================================
 # Helper: Date parsing + range
 # ============================================================
+def _request_now() -> datetime:
+    """utcnow() sekali per request (g), dipakai semua default tanggal/rentang."""
+    now = g.get("_now")
+    if now is None:
+        now = g._now = datetime.utcnow()
+    return now
+
+
 def _parse_date(date_str: str) -> datetime:
-    # input HTML date: YYYY-MM-DD
-    return datetime.strptime(date_str, "%Y-%m-%d")
+    # input HTML date: YYYY-MM-DD (fromisoformat jauh lebih cepat dari strptime)
+    d = date.fromisoformat(date_str)
+    return datetime(d.year, d.month, d.day)
+
+
+def _form_values(*names: str) -> tuple[str, ...]:
+    """Ambil beberapa field form sekaligus (sudah di-strip, kosong -> "")."""
+    form = request.form
+    return tuple((form.get(n) or "").strip() for n in names)
+
+
+def _clean_form(
+    fields: dict,
+    required_msg: str,
+    number_msg: str = "Nominal harus angka > 0.",
+    id_msg: str = "Data yang dipilih tidak valid.",
+) -> tuple | None:
+    """
+    Validasi form POST SEBELUM sentuh DB (query / _lock_items): input jelek
+    cukup flash, tanpa 500 dan tanpa kerja DB yang terbuang.
+    fields: {nama_field: jenis}, urutan = urutan hasil. Jenis:
+      "date"   -> datetime (wajib)      "number" -> float > 0 (wajib)
+      "id"     -> int (wajib)           "id?"    -> int | None
+      "text"   -> str (wajib)           "text?"  -> str, boleh ""
+      tuple    -> str, wajib salah satu isi tuple (mis. CASH_DIRECTIONS)
+    Gagal -> flash pesan yang cocok, return None (caller tinggal redirect).
+    """
+    raw = _form_values(*fields)
+    for value, kind in zip(raw, fields.values()):
+        if isinstance(kind, tuple):
+            ok = value in kind
+        else:
+            ok = bool(value) or kind.endswith("?")
+        if not ok:
+            flash(required_msg, "error")
+            return None
+
+    out = []
+    for value, kind in zip(raw, fields.values()):
+        if kind == "date":
+            try:
+                value = _parse_date(value)
+            except ValueError:
+                flash("Format tanggal tidak valid.", "error")
+                return None
+        elif kind == "number":
+            try:
+                value = float(value)
+            except ValueError:
+                value = 0.0
+            if not (math.isfinite(value) and value > 0):
+                flash(number_msg, "error")
+                return None
+        elif kind in ("id", "id?") and value:
+            try:
+                value = int(value)
+            except ValueError:
+                flash(id_msg, "error")
+                return None
+        elif kind == "id?":
+            value = None
+        out.append(value)
+    return tuple(out)
 
 
 def _parse_ymd(s: str | None) -> date | None:
+    s = (s or "").strip()
     if not s:
         return None
     try:
-        return datetime.strptime(s, "%Y-%m-%d").date()
+        return date.fromisoformat(s)
     except ValueError:
         return None
 
@@ -226,7 +322,7 @@ def _get_date_range_from_request(default_start_of_month: bool = True):
     dfrom = _parse_ymd(request.args.get("from"))
     dto = _parse_ymd(request.args.get("to"))
 
-    today = datetime.utcnow().date()
+    today = _request_now().date()
     if dto is None:
         dto = today
 
@@ -254,28 +350,16 @@ def _get_date_range_args():
     return from_dt, to_dt_excl, from_str, to_str
 
 
-# ============================================================
-# Helper: JournalLine -> JournalEntry FK (robust)
-# ============================================================
-def _jl_entry_fk():
-    """
-    Beberapa project pakai JournalLine.entry_id, sebagian journal_entry_id.
-    Kita detect otomatis.
-    """
-    if hasattr(JournalLine, "entry_id"):
-        return JournalLine.entry_id
-    if hasattr(JournalLine, "journal_entry_id"):
-        return JournalLine.journal_entry_id
-    raise AttributeError("JournalLine tidak punya entry_id / journal_entry_id")
-
-
 def _jl_base_query(acc: AccessCode | None, from_dt=None, to_dt_excl=None):
     """
     Base query JournalLine yang JOIN ke JournalEntry (biar bisa filter/order by tanggal).
     + scope per access_code_id kalau kolomnya ada.
+    Query read-only: autoflush dimatikan di query-nya (tidak flush pending changes).
     """
-    fk = _jl_entry_fk()
-    q = JournalLine.query.join(JournalEntry, fk == JournalEntry.id)
+    q = (
+        JournalLine.query.join(JournalEntry, JournalLine.entry_id == JournalEntry.id)
+        .autoflush(False)
+    )
     q = _apply_scope(q, acc, JournalEntry, JournalLine)
 
     if from_dt:
@@ -286,39 +370,11 @@ def _jl_base_query(acc: AccessCode | None, from_dt=None, to_dt_excl=None):
     return q
 
 
-# ============================================================
-# Helper: account balance (all time / optional date range)
-# ============================================================
-def _account_balance(
-    acc: AccessCode | None,
-    code: str,
-    from_str: str | None = None,
-    to_str: str | None = None,
-):
-    fk = _jl_entry_fk()
-    q = JournalLine.query.join(JournalEntry, fk == JournalEntry.id).filter(JournalLine.account_code == code)
-    q = _apply_scope(q, acc, JournalEntry, JournalLine)
-
-    if from_str:
-        q = q.filter(JournalEntry.date >= _parse_date(from_str))
-    if to_str:
-        q = q.filter(JournalEntry.date < (_parse_date(to_str) + timedelta(days=1)))
-
-    debit = q.with_entities(func.coalesce(func.sum(JournalLine.debit), 0.0)).scalar() or 0.0
-    credit = q.with_entities(func.coalesce(func.sum(JournalLine.credit), 0.0)).scalar() or 0.0
-    return float(debit) - float(credit)
-
-
 # ============================================================
 # Helper: account balance (BY DATE RANGE)
 # ============================================================
-def _account_balance_range(acc: AccessCode | None, code: str, from_dt=None, to_dt=None):
-    """
-    Balance debit-credit untuk akun pada rentang tanggal.
-    - from_dt/to_dt boleh date (inclusive) atau datetime
-    """
-    fk = _jl_entry_fk()
-
+def _range_bounds(from_dt=None, to_dt=None):
+    """from_dt/to_dt (date inclusive atau datetime) -> (from_dt, to_dt_excl) datetime."""
     if isinstance(from_dt, date) and not isinstance(from_dt, datetime):
         from_dt = datetime.combine(from_dt, datetime.min.time())
 
@@ -328,374 +384,635 @@ def _account_balance_range(acc: AccessCode | None, code: str, from_dt=None, to_d
             to_dt_excl = datetime.combine(to_dt, datetime.min.time()) + timedelta(days=1)
         else:
             to_dt_excl = to_dt + timedelta(days=1)
+    return from_dt, to_dt_excl
+
+
+def _account_balance_range(acc: AccessCode | None, code: str, from_dt=None, to_dt=None):
+    """
+    Balance debit-credit untuk akun pada rentang tanggal.
+    - from_dt/to_dt boleh date (inclusive) atau datetime
+    Banyak akun sekaligus: pakai _account_balances_range(..., codes=[...]).
+    """
+    return _account_balances_range(acc, from_dt, to_dt, codes=(code,))[code]
+
+
+def _account_balances_range(
+    acc: AccessCode | None, from_dt=None, to_dt=None, codes=None
+) -> dict[str, float]:
+    """
+    Sama seperti _account_balance_range tapi banyak akun sekaligus:
+    satu query GROUP BY account_code -> {code: debit - credit}.
+    codes=None: semua akun yang punya jurnal; kalau diisi, difilter IN
+    dan kode tanpa jurnal tetap muncul dengan 0.0.
+    """
+    from_dt, to_dt_excl = _range_bounds(from_dt, to_dt)
 
     q = (
         db.session.query(
-            func.coalesce(func.sum(JournalLine.debit), 0.0).label("debit"),
-            func.coalesce(func.sum(JournalLine.credit), 0.0).label("credit"),
+            JournalLine.account_code,
+            func.coalesce(func.sum(JournalLine.debit), 0.0),
+            func.coalesce(func.sum(JournalLine.credit), 0.0),
         )
-        .join(JournalEntry, fk == JournalEntry.id)
-        .filter(JournalLine.account_code == code)
+        .join(JournalEntry, JournalLine.entry_id == JournalEntry.id)
+        .group_by(JournalLine.account_code)
     )
     q = _apply_scope(q, acc, JournalEntry, JournalLine)
 
+    if codes is not None:
+        q = q.filter(JournalLine.account_code.in_(codes))
     if from_dt:
         q = q.filter(JournalEntry.date >= from_dt)
     if to_dt_excl:
         q = q.filter(JournalEntry.date < to_dt_excl)
 
-    row = q.first()
-    debit = float(row.debit or 0.0)
-    credit = float(row.credit or 0.0)
-    return debit - credit
+    # read-only: tidak perlu flush perubahan pending sebelum SELECT
+    with db.session.no_autoflush:
+        rows = q.all()
+    balances = dict.fromkeys(codes, 0.0) if codes is not None else {}
+    for code, debit, credit in rows:
+        balances[code] = float(debit or 0.0) - float(credit or 0.0)
+    return balances
+
+
+# ============================================================
+# Helper: Export Excel (write-only, streaming)
+# ============================================================
+_XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _xlsx_send(filename: str, title: str, header: list[str], rows, widths=None):
+    """
+    Export tabel ke .xlsx: Workbook(write_only=True) menulis baris per baris
+    (rows boleh generator/query iterator), jadi memori tidak tumbuh per cell.
+    File di-spool ke disk kalau > 8 MB, lalu dikirim lewat send_file.
+    openpyxl di-import di sini (bukan di atas modul): berat, dan cuma dipakai
+    saat export, jadi worker tidak bayar waktu import/RSS-nya saat boot.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])
+    for i, w in enumerate(widths or (), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+
+    head = []
+    for text in header:
+        cell = WriteOnlyCell(ws, value=text)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill("solid", fgColor="FF7A00")
+        cell.border = Border(bottom=Side(style="thin"))
+        cell.alignment = Alignment(horizontal="center")
+        head.append(cell)
+    ws.append(head)
+    for row in rows:
+        ws.append(list(row))
+
+    buf = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b")
+    wb.save(buf)
+    buf.seek(0)
+    return send_file(
+        buf, mimetype=_XLSX_MIME, as_attachment=True, download_name=filename, max_age=0
+    )
 
 
 # ============================================================
 # Helper: Set scope fields
 # ============================================================
-def _set_entry_scope(entry: JournalEntry, acc: AccessCode | None):
-    if acc and hasattr(entry, "access_code_id"):
-        entry.access_code_id = acc.id
+def _paginate(query, per_page: int):
+    """
+    Halaman ?page=N dari query yang sudah di-order: ambil per_page+1 baris
+    (baris ekstra cuma penanda ada halaman berikutnya), tanpa SELECT COUNT(*).
+    """
+    page = max(request.args.get("page", 1, type=int), 1)
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    pager = {"page": page, "has_prev": page > 1, "has_next": len(rows) > per_page}
+    return rows[:per_page], pager
+
+
+# master data yang jarang berubah (COA, supplier) per dapur, antar request:
+# {(jenis, acc_id): (versi, dimuat_pada, rows)}. Isinya Row kolom (bukan objek ORM)
+# jadi aman dipakai lintas session/thread. versi = (jumlah, id terbesar,
+# updated_at terbaru) baris master dapur itu, seperti sidik jurnal dashboard:
+# tambah/hapus mengubah jumlah atau id, rename/ubah tipe mengisi updated_at, jadi
+# tulis di worker gunicorn mana pun langsung membuat cache basi di semua worker.
+# TTL cuma pengaman untuk UPDATE mentah di luar app yang tidak mengisi updated_at.
+_MASTER_CACHE: dict[tuple[str, int], tuple[tuple, datetime, list]] = {}
+_MASTER_TTL = timedelta(seconds=60)
+_MASTER_MODELS = {"accounts": Account, "suppliers": Supplier}
+
+
+def _master_version(kind: str, acc: AccessCode) -> tuple:
+    """versi master dapur ini, dicek sekali per request (g): beberapa dropdown = 1 query."""
+    memo = g.setdefault("_master_versions", {})
+    ver = memo.get((kind, acc.id))
+    if ver is None:
+        model = _MASTER_MODELS[kind]
+        ver = memo[(kind, acc.id)] = tuple(
+            db.session.query(
+                func.count(model.id), func.max(model.id), func.max(model.updated_at)
+            )
+            .filter(model.access_code_id == acc.id)
+            .one()
+        )
+    return ver
+
+
+def _master_rows(kind: str, acc: AccessCode, load) -> list:
+    ver = _master_version(kind, acc)
+    now = _request_now()
+    hit = _MASTER_CACHE.get((kind, acc.id))
+    if hit is not None and hit[0] == ver and now - hit[1] < _MASTER_TTL:
+        return hit[2]
+    rows = load()
+    _MASTER_CACHE[(kind, acc.id)] = (ver, now, rows)
+    return rows
+
+
+def _invalidate_master(kind: str, acc: AccessCode) -> None:
+    """Setelah menulis master di request ini: versi di g dibuang supaya dicek ulang."""
+    g.get("_master_versions", {}).pop((kind, acc.id), None)
+    _MASTER_CACHE.pop((kind, acc.id), None)
+
+
+def _accounts_for(acc: AccessCode) -> list:
+    """COA dapur ini urut kode: baris (id, code, name, type), dari _MASTER_CACHE."""
+    return _master_rows(
+        "accounts",
+        acc,
+        lambda: db.session.query(Account.id, Account.code, Account.name, Account.type)
+        .filter(Account.access_code_id == acc.id)
+        .order_by(Account.code.asc())
+        .all(),
+    )
+
+
+def _accounts_of_type(acc: AccessCode, *types: str) -> list:
+    """Dropdown akun per tipe (urut kode), disaring dari COA cache tanpa query."""
+    return [a for a in _accounts_for(acc) if a.type in types]
+
+
+def _expense_account_options(acc: AccessCode) -> tuple[list, list]:
+    """Dropdown form biaya: (akun Kas & Bank, akun Beban) dari COA cache."""
+    return _accounts_of_type(acc, "Kas & Bank"), _accounts_of_type(acc, "Beban", "Beban Lain")
+
+
+def _item_options(acc: AccessCode) -> list:
+    """Dropdown bahan: baris (id, name, unit, stock_qty) saja, urut nama."""
+    return (
+        db.session.query(Item.id, Item.name, Item.unit, Item.stock_qty)
+        .filter(Item.access_code_id == acc.id)
+        .order_by(Item.name.asc())
+        .all()
+    )
+
+
+def _purchase_form_options(acc: AccessCode) -> tuple[list, list]:
+    """Dropdown form pembelian: (supplier, bahan) dapur ini, urut nama. GET saja."""
+    # bahan tidak di-cache: stok_qty di dropdown berubah tiap pembelian/pemakaian
+    suppliers = _master_rows(
+        "suppliers",
+        acc,
+        lambda: db.session.query(Supplier.id, Supplier.name)
+        .filter(Supplier.access_code_id == acc.id)
+        .order_by(Supplier.name.asc())
+        .all(),
+    )
+    return suppliers, _item_options(acc)
+
+
+def _purchase_item_and_supplier(acc: AccessCode, item_id: int, supplier_id: int | None):
+    """
+    Validasi form pembelian dalam SATU query: (Item, supplier_id, supplier_name).
+    Supplier di-LEFT JOIN, jadi kosong / tidak valid -> (Item, None, None).
+    Item tidak valid -> None.
+    """
+    return (
+        db.session.query(Item, Supplier.id, Supplier.name)
+        .outerjoin(Supplier, and_(Supplier.access_code_id == acc.id, Supplier.id == supplier_id))
+        .filter(Item.access_code_id == acc.id, Item.id == item_id)
+        .first()
+    )
+
+
+def _scoped_get(model, acc: AccessCode, obj_id):
+    """
+    Satu baris milik dapur ini per id, None kalau tidak ada / milik dapur lain.
+    session.get() cek identity map dulu: baris yang sudah dimuat di request ini
+    (mis. bahan lama = bahan baru saat edit) tidak di-SELECT ulang.
+    """
+    obj = db.session.get(model, obj_id)
+    if obj is None or obj.access_code_id != acc.id:
+        return None
+    return obj
+
+
+def _scoped_or_404(model, acc: AccessCode, obj_id):
+    """Seperti _scoped_get tapi 404 kalau tidak ada / milik dapur lain."""
+    obj = _scoped_get(model, acc, obj_id)
+    if obj is None:
+        abort(404)
+    return obj
+
+
+def _purchase_with_item(acc: AccessCode, purchase_id: int) -> tuple[Purchase, PurchaseItem | None]:
+    """Purchase dapur ini (404 kalau tidak ada) + item pertamanya (sudah selectin)."""
+    purchase = _scoped_or_404(Purchase, acc, purchase_id)
+    return purchase, (purchase.items[0] if purchase.items else None)
 
 
 def _set_obj_scope(obj, acc: AccessCode | None):
-    if acc and hasattr(obj, "access_code_id"):
+    if acc and isinstance(obj, TenantScoped):
         obj.access_code_id = acc.id
 
 
+# ============================================================
+# Kolom tabel riwayat: cukup yang dibaca template (Row, bukan objek ORM penuh)
+# ============================================================
+_CASH_LIST_COLS = (
+    CashTransaction.id,
+    CashTransaction.date,
+    CashTransaction.direction,
+    CashTransaction.cash_account_code,
+    CashTransaction.cash_account_name,
+    CashTransaction.counter_account_code,
+    CashTransaction.counter_account_name,
+    CashTransaction.amount,
+    CashTransaction.memo,
+)
+_PURCHASE_LIST_COLS = (
+    Purchase.id,
+    Purchase.date,
+    Purchase.supplier_name,
+    Purchase.total_amount,
+    Purchase.memo,
+)
+_SUPPLIER_LIST_COLS = (Supplier.name, Supplier.phone, Supplier.address)
+_ITEM_LIST_COLS = (
+    Item.name,
+    Item.category,
+    Item.unit,
+    Item.min_stock,
+    Item.stock_qty,
+    Item.avg_cost,
+)
+_AP_PAYMENT_LIST_COLS = (
+    APayment.id,
+    APayment.date,
+    APayment.supplier_name,
+    APayment.cash_account_code,
+    APayment.cash_account_name,
+    APayment.amount,
+    APayment.memo,
+)
+
+# dropdown form pembayaran: cukup kolom yang ditampilkan di <option>
+_PURCHASE_OPTION_COLS = (Purchase.id, Purchase.date, Purchase.supplier_name, Purchase.total_amount)
+_INVOICE_OPTION_COLS = (
+    SalesInvoice.id,
+    SalesInvoice.date,
+    SalesInvoice.invoice_no,
+    SalesInvoice.customer_name,
+    SalesInvoice.total_amount,
+    SalesInvoice.paid_amount,
+)
+# kolom invoice yang dibaca saat input pelunasan (cek sisa + memo/akun jurnal)
+_AR_PAYMENT_INVOICE_COLS = (
+    SalesInvoice.id,
+    SalesInvoice.invoice_no,
+    SalesInvoice.customer_name,
+    SalesInvoice.ar_account_code,
+    SalesInvoice.ar_account_name,
+    SalesInvoice.total_amount,
+    SalesInvoice.paid_amount,
+)
+# form input baru cukup dokumen terbaru; dapur besar tidak memuat ribuan <option>
+_OPTION_LIMIT = 500
+
+
 # ============================================================
 # Helper: Jurnal otomatis (scoped)
 # ============================================================
-def _create_journal_for_cash(acc: AccessCode | None, tx: CashTransaction) -> JournalEntry:
-    entry = JournalEntry(date=tx.date, memo=tx.memo, source="cash", source_id=tx.id)
-    _set_entry_scope(entry, acc)
+def _load_accounts(acc: AccessCode, codes) -> dict:
+    """
+    Ambil beberapa akun dapur ini sekaligus, di-key per kode (baris code/name/type).
+    Dilayani dari COA cache (versinya sudah dicek), jadi kode yang tidak ketemu
+    memang tidak ada -> tidak valid, tanpa muat ulang.
+    """
+    codes = {c for c in codes if c}
+    if not codes:
+        return {}
+    by_code = {a.code: a for a in _accounts_for(acc)}
+    return {c: by_code[c] for c in codes if c in by_code}
 
-    if tx.direction == "in":
-        entry.lines.append(
-            JournalLine(
-                account_code=tx.cash_account_code,
-                account_name=tx.cash_account_name,
-                debit=tx.amount,
-                credit=0,
-            )
-        )
-        entry.lines.append(
-            JournalLine(
-                account_code=tx.counter_account_code,
-                account_name=tx.counter_account_name,
-                debit=0,
-                credit=tx.amount,
-            )
-        )
-    else:
-        entry.lines.append(
-            JournalLine(
-                account_code=tx.counter_account_code,
-                account_name=tx.counter_account_name,
-                debit=tx.amount,
-                credit=0,
-            )
-        )
-        entry.lines.append(
-            JournalLine(
-                account_code=tx.cash_account_code,
-                account_name=tx.cash_account_name,
-                debit=0,
-                credit=tx.amount,
-            )
-        )
 
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
+def _get_account(acc: AccessCode, code: str | None):
+    return _load_accounts(acc, (code,)).get(code)
 
-    db.session.add(entry)
-    db.session.flush()
-    return entry
 
-def _build_cash_lines(tx: CashTransaction):
-    """Return list[JournalLine] untuk transaksi kas."""
-    if tx.direction == "in":
-        return [
-            JournalLine(
-                account_code=tx.cash_account_code,
-                account_name=tx.cash_account_name,
-                debit=tx.amount,
-                credit=0,
-            ),
-            JournalLine(
-                account_code=tx.counter_account_code,
-                account_name=tx.counter_account_name,
-                debit=0,
-                credit=tx.amount,
-            ),
-        ]
+def _post_journal(
+    acc: AccessCode, lines: list[dict], reuse_entry_id: int | None = None, **entry_fields
+) -> JournalEntry:
+    """
+    Buat JournalEntry + semua line-nya: entry di-flush untuk dapat id,
+    line masuk lewat satu INSERT multi-row (bukan append ORM satu per satu).
+    lines: dict berisi account_code, account_name, debit, credit.
+    reuse_entry_id: entry lama yang header-nya ditulis ulang (edit dokumen).
+    """
+    entry = (
+        _rewrite_journal_entry(acc, reuse_entry_id, entry_fields) if reuse_entry_id else None
+    )
+    if entry is None:
+        entry = JournalEntry(access_code_id=acc.id, **entry_fields)
+        db.session.add(entry)
+        db.session.flush()
+    pending = g.get("_pending_lines")
+    if pending is not None:
+        pending.append((entry.id, lines))
     else:
-        return [
-            JournalLine(
-                account_code=tx.counter_account_code,
-                account_name=tx.counter_account_name,
-                debit=tx.amount,
-                credit=0,
-            ),
-            JournalLine(
-                account_code=tx.cash_account_code,
-                account_name=tx.cash_account_name,
-                debit=0,
-                credit=tx.amount,
-            ),
-        ]
+        JournalLine.bulk_create(db.session, acc.id, entry.id, lines)
+    return entry
 
 
-def _rebuild_journal_for_cash(acc: AccessCode, tx: CashTransaction) -> JournalEntry:
-    # 1. PUTUS FK DULU
-    old_entry_id = tx.journal_entry_id
-    tx.journal_entry_id = None
-    db.session.flush()
+def _rewrite_journal_entry(acc: AccessCode, entry_id: int, entry_fields: dict) -> JournalEntry | None:
+    """
+    Edit dokumen: header entry lama di-UPDATE di tempat (RETURNING, tanpa SELECT)
+    dan line lamanya dihapus; line baru lalu masuk lewat INSERT biasa di _post_journal.
+    updated_at diisi supaya sidik jurnal dashboard ikut berubah.
+    None kalau entry sudah tidak ada -> caller bikin entry baru.
+    """
+    entry = db.session.execute(
+        update(JournalEntry)
+        .where(JournalEntry.access_code_id == acc.id, JournalEntry.id == entry_id)
+        .values(updated_at=_request_now(), **entry_fields)
+        .returning(JournalEntry)
+        .options(lazyload(JournalEntry.lines))
+    ).scalar_one_or_none()
+    if entry is None:
+        return None
+    db.session.execute(
+        delete(JournalLine).where(
+            JournalLine.access_code_id == acc.id, JournalLine.entry_id == entry_id
+        )
+    )
+    # koleksi lines yang mungkin sudah ter-load di session sekarang basi
+    db.session.expire(entry, ["lines"])
+    return entry
 
-    # 2. HAPUS JOURNAL LAMA (SCOPED)
-    if old_entry_id:
-        JournalLine.query.filter_by(
-            access_code_id=acc.id,
-            entry_id=old_entry_id
-        ).delete()
-        JournalEntry.query.filter_by(
-            access_code_id=acc.id,
-            id=old_entry_id
-        ).delete()
-        db.session.flush()
 
-    # 3. BUAT ENTRY BARU
-    entry = JournalEntry(
-        access_code_id=acc.id,
+@contextmanager
+def _batched_journal_lines(acc: AccessCode):
+    """
+    Untuk rebuild massal: line semua entry yang dibuat di dalam blok ini
+    dikumpulkan, lalu masuk lewat SATU INSERT executemany di akhir blok.
+    """
+    g._pending_lines = pending = []
+    try:
+        yield
+    finally:
+        g.pop("_pending_lines", None)
+    JournalLine.bulk_create_many(db.session, acc.id, pending)
+
+
+def _create_journal_for_cash(
+    acc: AccessCode, tx: CashTransaction, reuse_entry_id: int | None = None
+) -> JournalEntry:
+    return _post_journal(
+        acc,
+        _build_cash_lines(tx),
+        reuse_entry_id=reuse_entry_id,
         date=tx.date,
         memo=tx.memo,
         source="cash",
         source_id=tx.id,
     )
-    db.session.add(entry)
-    db.session.flush()
 
-    # 4. BUAT LINES (WAJIB access_code_id)
-    if tx.direction == "out":
-        debit_code = tx.counter_account_code
-        debit_name = tx.counter_account_name
-        credit_code = tx.cash_account_code
-        credit_name = tx.cash_account_name
+
+def _build_cash_lines(tx: CashTransaction) -> list[dict]:
+    """
+    Baris jurnal transaksi kas (dict untuk JournalLine.bulk_create).
+    access_code_id + entry_id langsung diisi bulk_create saat INSERT,
+    jadi tidak ada loop set scope per line setelahnya.
+    """
+    if tx.direction == "in":
+        debit_code, debit_name = tx.cash_account_code, tx.cash_account_name
+        credit_code, credit_name = tx.counter_account_code, tx.counter_account_name
     else:
-        debit_code = tx.cash_account_code
-        debit_name = tx.cash_account_name
-        credit_code = tx.counter_account_code
-        credit_name = tx.counter_account_name
+        debit_code, debit_name = tx.counter_account_code, tx.counter_account_name
+        credit_code, credit_name = tx.cash_account_code, tx.cash_account_name
 
-    db.session.add_all([
-        JournalLine(
-            access_code_id=acc.id,
-            entry_id=entry.id,
-            account_code=debit_code,
-            account_name=debit_name,
-            debit=tx.amount,
-            credit=0,
-        ),
-        JournalLine(
-            access_code_id=acc.id,
-            entry_id=entry.id,
-            account_code=credit_code,
-            account_name=credit_name,
-            debit=0,
-            credit=tx.amount,
-        ),
-    ])
+    return [
+        dict(account_code=debit_code, account_name=debit_name, debit=tx.amount, credit=0),
+        dict(account_code=credit_code, account_name=credit_name, debit=0, credit=tx.amount),
+    ]
 
-    db.session.flush()
 
-    # 5. SET FK KEMBALI
-    tx.journal_entry_id = entry.id
+def _rebuild_journal(acc: AccessCode, owner, create_journal) -> JournalEntry:
+    """
+    Rebuild jurnal generik untuk dokumen yang punya journal_entry_id
+    (kas, pembelian, ...). create_journal(acc, owner, reuse_entry_id=...) bikin
+    entry + lines baru, atau menulis ulang entry reuse_entry_id.
+    """
+    # entry lama dipakai ulang (header UPDATE, lines diganti) -> id & FK owner tetap,
+    # tidak ada INSERT entry + DELETE entry lama + UPDATE FK owner
+    old_entry_id = owner.journal_entry_id
+    entry = create_journal(acc, owner, reuse_entry_id=old_entry_id)
+    if entry.id == old_entry_id:
+        return entry
+
+    # entry lama sudah hilang / dokumen baru: PINDAH FK ke entry baru, HAPUS yang lama.
+    # urutan ini tidak pernah melanggar FK, jadi tidak perlu flush tambahan:
+    # autoflush sebelum DELETE sudah meng-UPDATE owner ke entry baru
+    owner.journal_entry_id = entry.id
+    _delete_journal_entry_scoped(acc, old_entry_id)
     return entry
 
 
-def _create_journal_for_purchase(acc: AccessCode | None, purchase: Purchase) -> JournalEntry:
+def _rebuild_journal_for_cash(acc: AccessCode, tx: CashTransaction) -> JournalEntry:
+    return _rebuild_journal(acc, tx, _create_journal_for_cash)
+
+
+def _create_journal_for_purchase(
+    acc: AccessCode,
+    purchase: Purchase,
+    accounts: dict | None = None,
+    reuse_entry_id: int | None = None,
+) -> JournalEntry:
     """
     Pembelian hutang:
     Debit Persediaan (10051)
     Kredit Hutang Usaha (20011)
     """
-    entry = JournalEntry(date=purchase.date, memo=purchase.memo, source="purchase", source_id=purchase.id)
-    _set_entry_scope(entry, acc)
     amount = float(purchase.total_amount or 0)
 
-    inventory_acc = Account.query.filter_by(code="10051").first()
-    ap_acc = Account.query.filter_by(code="20011").first()
+    if accounts is None:
+        accounts = _load_accounts(acc, {"10051", "20011"})
+    inventory_acc = accounts.get("10051")
+    ap_acc = accounts.get("20011")
     if not inventory_acc or not ap_acc:
         raise Exception("Akun Persediaan (10051) atau Hutang Usaha (20011) belum ada.")
 
-    entry.lines.append(
-        JournalLine(account_code=inventory_acc.code, account_name=inventory_acc.name, debit=amount, credit=0)
-    )
-    entry.lines.append(
-        JournalLine(account_code=ap_acc.code, account_name=ap_acc.name, debit=0, credit=amount)
-    )
-
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
-
-    db.session.add(entry)
-    db.session.flush()
-    return entry
-
-
-def _create_journal_for_ap_payment(acc: AccessCode | None, payment: APayment) -> JournalEntry:
+    return _post_journal(
+        acc,
+        [
+            dict(account_code=inventory_acc.code, account_name=inventory_acc.name, debit=amount, credit=0),
+            dict(account_code=ap_acc.code, account_name=ap_acc.name, debit=0, credit=amount),
+        ],
+        reuse_entry_id=reuse_entry_id,
+        date=purchase.date,
+        memo=purchase.memo,
+        source="purchase",
+        source_id=purchase.id,
+    )
+
+
+def _create_journal_for_ap_payment(
+    acc: AccessCode,
+    payment: APayment,
+    accounts: dict | None = None,
+    reuse_entry_id: int | None = None,
+) -> JournalEntry:
     """
     Bayar hutang:
     Debit Hutang Usaha (20011)
     Kredit Kas/Bank (dipilih)
     """
-    entry = JournalEntry(date=payment.date, memo=payment.memo, source="ap_payment", source_id=payment.id)
-    _set_entry_scope(entry, acc)
-
-    ap_acc = Account.query.filter_by(code="20011").first()
-    cash_acc = Account.query.filter_by(code=payment.cash_account_code).first()
+    if accounts is None:
+        accounts = _load_accounts(acc, {"20011", payment.cash_account_code})
+    ap_acc = accounts.get("20011")
+    cash_acc = accounts.get(payment.cash_account_code)
     if not ap_acc or not cash_acc:
         raise Exception("Akun Hutang Usaha atau Kas/Bank tidak ditemukan.")
 
-    entry.lines.append(
-        JournalLine(account_code=ap_acc.code, account_name=ap_acc.name, debit=float(payment.amount or 0), credit=0)
-    )
-    entry.lines.append(
-        JournalLine(account_code=cash_acc.code, account_name=cash_acc.name, debit=0, credit=float(payment.amount or 0))
-    )
-
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
-
-    db.session.add(entry)
-    db.session.flush()
-    return entry
-
-
-def _create_journal_for_stock_usage(acc: AccessCode | None, u: StockUsage) -> JournalEntry:
+    amount = float(payment.amount or 0)
+    return _post_journal(
+        acc,
+        [
+            dict(account_code=ap_acc.code, account_name=ap_acc.name, debit=amount, credit=0),
+            dict(account_code=cash_acc.code, account_name=cash_acc.name, debit=0, credit=amount),
+        ],
+        reuse_entry_id=reuse_entry_id,
+        date=payment.date,
+        memo=payment.memo,
+        source="ap_payment",
+        source_id=payment.id,
+    )
+
+
+def _create_journal_for_stock_usage(
+    acc: AccessCode,
+    u: StockUsage,
+    accounts: dict | None = None,
+    reuse_entry_id: int | None = None,
+) -> JournalEntry:
     """
     Pemakaian stok:
     Debit HPP (dipilih)
     Kredit Persediaan (10051)
     """
-    inv_acc = Account.query.filter_by(code="10051").first()
-    hpp_acc = Account.query.filter_by(code=u.hpp_account_code).first()
+    if accounts is None:
+        accounts = _load_accounts(acc, {"10051", u.hpp_account_code})
+    inv_acc = accounts.get("10051")
+    hpp_acc = accounts.get(u.hpp_account_code)
     if not inv_acc or not hpp_acc:
         raise Exception("Akun Persediaan (10051) atau akun HPP tidak ditemukan.")
 
-    entry = JournalEntry(date=u.date, memo=u.memo, source="stock_usage", source_id=u.id)
-    _set_entry_scope(entry, acc)
-
-    entry.lines.append(
-        JournalLine(account_code=hpp_acc.code, account_name=hpp_acc.name, debit=float(u.total_cost or 0), credit=0)
-    )
-    entry.lines.append(
-        JournalLine(account_code=inv_acc.code, account_name=inv_acc.name, debit=0, credit=float(u.total_cost or 0))
+    amount = float(u.total_cost or 0)
+    return _post_journal(
+        acc,
+        [
+            dict(account_code=hpp_acc.code, account_name=hpp_acc.name, debit=amount, credit=0),
+            dict(account_code=inv_acc.code, account_name=inv_acc.name, debit=0, credit=amount),
+        ],
+        reuse_entry_id=reuse_entry_id,
+        date=u.date,
+        memo=u.memo,
+        source="stock_usage",
+        source_id=u.id,
     )
 
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
-
-    db.session.add(entry)
-    db.session.flush()
-    return entry
-
 
-def _next_invoice_no(prefix="INV"):
-    today = datetime.utcnow().strftime("%Y%m%d")
+def _next_invoice_no(acc: AccessCode, prefix="INV"):
+    """
+    Nomor invoice berikutnya hari ini (INV-YYYYMMDD-001, ...), per dapur.
+    Range invoice_no >= base AND < base+'~' jalan di
+    uq_sales_invoices_tenant_invoice_no (beda dengan LIKE yang di Postgres tidak
+    bisa pakai index biasa); isinya hanya invoice hari itu, jadi sort kecil.
+    Urut length DESC dulu: sebagai teks "1000" < "999".
+    """
+    today = _request_now().strftime("%Y%m%d")
     base = f"{prefix}-{today}-"
-    last = (
-        SalesInvoice.query.filter(SalesInvoice.invoice_no.like(base + "%"))
-        .order_by(SalesInvoice.id.desc())
-        .first()
+    last_no = (
+        db.session.query(SalesInvoice.invoice_no)
+        .filter(
+            SalesInvoice.access_code_id == acc.id,
+            SalesInvoice.invoice_no >= base,
+            SalesInvoice.invoice_no < base + "~",
+        )
+        .order_by(
+            func.length(SalesInvoice.invoice_no).desc(),
+            SalesInvoice.invoice_no.desc(),
+        )
+        .limit(1)
+        .scalar()
     )
-    if not last:
+    if not last_no:
         return base + "001"
     try:
-        seq = int(last.invoice_no.split("-")[-1]) + 1
-    except Exception:
+        seq = int(last_no.split("-")[-1]) + 1
+    except ValueError:
         seq = 1
     return base + f"{seq:03d}"
 
 
-def _create_journal_for_invoice(acc: AccessCode | None, inv: SalesInvoice) -> JournalEntry:
-    entry = JournalEntry(
+def _create_journal_for_invoice(acc: AccessCode, inv: SalesInvoice) -> JournalEntry:
+    amount = float(inv.total_amount or 0)
+    return _post_journal(
+        acc,
+        [
+            dict(account_code=inv.ar_account_code, account_name=inv.ar_account_name, debit=amount, credit=0),
+            dict(
+                account_code=inv.revenue_account_code,
+                account_name=inv.revenue_account_name,
+                debit=0,
+                credit=amount,
+            ),
+        ],
         date=inv.date,
         memo=f"Invoice {inv.invoice_no} - {inv.customer_name}",
         source="sales_invoice",
         source_id=inv.id,
     )
-    _set_entry_scope(entry, acc)
-
-    entry.lines.append(
-        JournalLine(
-            account_code=inv.ar_account_code,
-            account_name=inv.ar_account_name,
-            debit=float(inv.total_amount or 0),
-            credit=0,
-        )
-    )
-    entry.lines.append(
-        JournalLine(
-            account_code=inv.revenue_account_code,
-            account_name=inv.revenue_account_name,
-            debit=0,
-            credit=float(inv.total_amount or 0),
-        )
-    )
-
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
-
-    db.session.add(entry)
-    db.session.flush()
-    return entry
 
 
-def _create_journal_for_ar_payment(acc: AccessCode | None, p: ARPayment, inv: SalesInvoice) -> JournalEntry:
-    entry = JournalEntry(
+def _create_journal_for_ar_payment(
+    acc: AccessCode, p: ARPayment, inv: SalesInvoice, reuse_entry_id: int | None = None
+) -> JournalEntry:
+    amount = float(p.amount or 0)
+    return _post_journal(
+        acc,
+        [
+            dict(account_code=p.cash_account_code, account_name=p.cash_account_name, debit=amount, credit=0),
+            dict(account_code=inv.ar_account_code, account_name=inv.ar_account_name, debit=0, credit=amount),
+        ],
+        reuse_entry_id=reuse_entry_id,
         date=p.date,
         memo=f"Pelunasan {inv.invoice_no} - {inv.customer_name}",
         source="ar_payment",
         source_id=p.id,
     )
-    _set_entry_scope(entry, acc)
-
-    entry.lines.append(
-        JournalLine(
-            account_code=p.cash_account_code,
-            account_name=p.cash_account_name,
-            debit=float(p.amount or 0),
-            credit=0,
-        )
-    )
-    entry.lines.append(
-        JournalLine(
-            account_code=inv.ar_account_code,
-            account_name=inv.ar_account_name,
-            debit=0,
-            credit=float(p.amount or 0),
-        )
-    )
 
-    if acc:
-        for ln in entry.lines:
-            if hasattr(ln, "access_code_id"):
-                ln.access_code_id = acc.id
 
-    db.session.add(entry)
-    db.session.flush()
-    return entry
+def _rebuild_journal_for_ar_payment(acc: AccessCode, pay: ARPayment) -> JournalEntry:
+    return _rebuild_journal(
+        acc,
+        pay,
+        lambda a, p, reuse_entry_id: _create_journal_for_ar_payment(
+            a, p, p.invoice, reuse_entry_id=reuse_entry_id
+        ),
+    )
 
 
 def _arpay_memo(customer: str | None, note: str | None) -> str:
@@ -754,6 +1071,10 @@ def admin_create_code():
     status = (request.form.get("status") or "active").strip()
     days_str = (request.form.get("days") or "30").strip()
 
+    if status not in ("active", "trial"):
+        flash("Status harus active atau trial.", "error")
+        return redirect(url_for("main.admin_codes"))
+
     try:
         days = int(days_str)
         if days <= 0:
@@ -895,7 +1216,39 @@ def create_trial():
     return redirect(url_for("main.dashboard"))
 
 
+# saldo dashboard per dapur: {acc_id: (key, dibuat_pada, balances)}
+# key ikut sidik jurnal (jumlah + id terbesar + updated_at terbaru): posting/hapus/
+# rebuild mengubah jumlah atau id, edit di tempat mengisi updated_at, jadi cache
+# otomatis basi di semua worker gunicorn tanpa invalidasi manual. TTL cuma pengaman.
+_DASHBOARD_CACHE: dict[int, tuple] = {}
+_DASHBOARD_TTL = timedelta(seconds=60)
+
+
+def _journal_fingerprint(acc: AccessCode) -> tuple:
+    return tuple(
+        db.session.query(
+            func.count(JournalEntry.id),
+            func.max(JournalEntry.id),
+            func.max(JournalEntry.updated_at),
+        )
+        .filter(JournalEntry.access_code_id == acc.id)
+        .one()
+    )
+
+
+def _dashboard_balances(acc: AccessCode, dfrom, dto) -> dict[str, float]:
+    now = _request_now()
+    key = (dfrom, dto, _journal_fingerprint(acc))
+    hit = _DASHBOARD_CACHE.get(acc.id)
+    if hit is not None and hit[0] == key and now - hit[1] < _DASHBOARD_TTL:
+        return hit[2]
+    balances = _account_balances_range(acc, dfrom, dto)
+    _DASHBOARD_CACHE[acc.id] = (key, now, balances)
+    return balances
+
+
 @bp.get("/dashboard")
+@query_budget(5)
 def dashboard():
     acc = _get_active_access()
     if not acc:
@@ -903,21 +1256,27 @@ def dashboard():
             return redirect(url_for("main.expired"))
         return redirect(url_for("main.enter_code"))
 
-    remaining = acc.expires_at - datetime.utcnow()
+    now = _request_now()
+    remaining = acc.expires_at - now
     remaining_hours = max(0, int(remaining.total_seconds() // 3600))
 
     # ALL-TIME range
     dfrom = datetime(2000, 1, 1)
-    now = datetime.utcnow()
     dto = datetime(now.year, now.month, now.day, 23, 59, 59)
 
+    # semua saldo dalam satu query GROUP BY (di-cache per dapur), COA sekali (cache g)
+    balances = _dashboard_balances(acc, dfrom, dto)
+    # akun dikelompokkan per tipe sekali jalan (masih urut kode)
+    by_type: dict[str, list] = defaultdict(list)
+    for a in _accounts_for(acc):
+        by_type[a.type].append(a)
+
     def bal(code: str) -> float:
-        return float(_account_balance_range(acc, code, dfrom, dto))
+        return balances.get(code, 0.0)
 
     def sum_by_type(t: str) -> float:
-        accs = Account.query.filter(Account.type == t).all()
         total = 0.0
-        for a in accs:
+        for a in by_type[t]:
             b = bal(a.code)
             if t in ("Pendapatan", "Pendapatan Lain"):
                 total += -b
@@ -936,9 +1295,8 @@ def dashboard():
     net_profit = operating_profit + rev_other - exp_other
 
     # Top Beban Operasional
-    exp_accounts = Account.query.filter(Account.type == "Beban").all()
     tmp = []
-    for a in exp_accounts:
+    for a in by_type["Beban"]:
         amt = bal(a.code)
         if amt and amt > 0:
             tmp.append((a.name, float(amt)))
@@ -948,11 +1306,10 @@ def dashboard():
     top_exp_values = [x[1] for x in tmp]
 
     # Kas & Bank
-    cash_accounts = Account.query.filter(Account.type == "Kas & Bank").order_by(Account.code.asc()).all()
     cash_labels = []
     cash_values = []
     cash_total = 0.0
-    for a in cash_accounts:
+    for a in by_type["Kas & Bank"]:
         b = bal(a.code)
         cash_labels.append(f"{a.code} {a.name}")
         cash_values.append(float(b))
@@ -1039,24 +1396,23 @@ def master_accounts():
             return redirect(url_for("main.master_accounts"))
 
         # ✅ unique per dapur (access_code_id)
-        exists = Account.query.filter_by(access_code_id=acc.id, code=code).first()
-        if exists:
+        dup = db.session.query(
+            exists().where(Account.access_code_id == acc.id, Account.code == code)
+        ).scalar()
+        if dup:
             flash("Kode akun sudah ada di dapur ini.", "error")
             return redirect(url_for("main.master_accounts"))
 
         obj = Account(access_code_id=acc.id, code=code, name=name, type=atype)
         db.session.add(obj)
         db.session.commit()
+        _invalidate_master("accounts", acc)
 
         flash("Akun berhasil ditambahkan.", "success")
         return redirect(url_for("main.master_accounts"))
 
-    accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .order_by(Account.code.asc())
-        .all()
-    )
-    return render_template("master_accounts.html", accounts=accounts)
+    # COA yang sama dipakai dropdown & saldo: ambil dari memo request (urut kode)
+    return render_template("master_accounts.html", accounts=_accounts_for(acc))
 
 
 @bp.post("/master/accounts/seed")
@@ -1100,21 +1456,22 @@ def seed_accounts():
         ("80011", "Biaya Adm Bank", "Beban Lain"),
     ]
 
-    inserted = 0
-    skipped = 0
-
-    for code, name, atype in standard_accounts:
-        exists = Account.query.filter_by(access_code_id=acc.id, code=code).first()
-        if exists:
-            skipped += 1
-            continue
-
-        db.session.add(
-            Account(access_code_id=acc.id, code=code, name=name, type=atype)
-        )
-        inserted += 1
+    # satu SELECT kode yang sudah ada + satu INSERT multi-row untuk yang belum
+    existing = {
+        c for (c,) in db.session.query(Account.code).filter(Account.access_code_id == acc.id)
+    }
+    rows = [
+        dict(access_code_id=acc.id, code=code, name=name, type=atype)
+        for code, name, atype in standard_accounts
+        if code not in existing
+    ]
+    if rows:
+        db.session.execute(insert(Account), rows)
+    inserted = len(rows)
+    skipped = len(standard_accounts) - inserted
 
     db.session.commit()
+    _invalidate_master("accounts", acc)
     flash(f"Import akun standar selesai. Ditambah: {inserted}, dilewati: {skipped}.", "success")
     return redirect(url_for("main.master_accounts"))
 
@@ -1145,12 +1502,14 @@ def master_suppliers():
         )
         db.session.add(obj)
         db.session.commit()
+        _invalidate_master("suppliers", acc)
 
         flash("Supplier berhasil ditambahkan.", "success")
         return redirect(url_for("main.master_suppliers"))
 
     suppliers = (
-        Supplier.query.filter_by(access_code_id=acc.id)
+        db.session.query(*_SUPPLIER_LIST_COLS)
+        .filter(Supplier.access_code_id == acc.id)
         .order_by(Supplier.name.asc())
         .all()
     )
@@ -1198,7 +1557,8 @@ def master_items():
         return redirect(url_for("main.master_items"))
 
     items = (
-        Item.query.filter_by(access_code_id=acc.id)
+        db.session.query(*_ITEM_LIST_COLS)
+        .filter(Item.access_code_id == acc.id)
         .order_by(Item.name.asc())
         .all()
     )
@@ -1220,46 +1580,40 @@ def master_items():
 # Kas
 # ============================================================
 @bp.route("/cash", methods=["GET", "POST"])
+@query_budget(4)
 def cash_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .order_by(Account.code.asc())
-        .all()
-    )
 
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        direction = (request.form.get("direction") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        counter_code = (request.form.get("counter_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or direction not in ("in", "out") or not cash_code or not counter_code or not amount_str:
-            flash("Tanggal, tipe, akun kas/bank, akun lawan, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.cash_home"))
-
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "direction": CASH_DIRECTIONS,
+                "cash_account": "text",
+                "counter_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, tipe, akun kas/bank, akun lawan, dan nominal wajib diisi.",
+        )
+        if form is None:
             return redirect(url_for("main.cash_home"))
+        tx_date, direction, cash_code, counter_code, amount, memo = form
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
-        counter_acc = Account.query.filter_by(access_code_id=acc.id, code=counter_code).first()
+        picked = _load_accounts(acc, {cash_code, counter_code})
+        cash_acc = picked.get(cash_code)
+        counter_acc = picked.get(counter_code)
         if not cash_acc or not counter_acc:
             flash("Akun tidak valid. Pastikan sudah ada di COA.", "error")
             return redirect(url_for("main.cash_home"))
 
         tx = CashTransaction(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=tx_date,
             direction=direction,
             cash_account_code=cash_acc.code,
             cash_account_name=cash_acc.name,
@@ -1277,13 +1631,14 @@ def cash_home():
         flash("Transaksi kas tersimpan & jurnal otomatis dibuat.", "success")
         return redirect(url_for("main.cash_home"))
 
-    txs = (
-        CashTransaction.query.filter_by(access_code_id=acc.id)
-        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc())
-        .limit(50)
-        .all()
+    txs, pager = _paginate(
+        db.session.query(*_CASH_LIST_COLS)
+        .filter(CashTransaction.access_code_id == acc.id)
+        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc()),
+        per_page=50,
     )
-    return render_template("cash_home.html", accounts=accounts, txs=txs)
+    accounts = _accounts_for(acc)
+    return render_template("cash_home.html", accounts=accounts, txs=txs, pager=pager)
 
 
 @bp.route("/cash/<int:tx_id>/edit", methods=["GET", "POST"])
@@ -1292,41 +1647,33 @@ def cash_edit(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
-    accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        direction = (request.form.get("direction") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        counter_code = (request.form.get("counter_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or direction not in ("in", "out") or not cash_code or not counter_code or not amount_str:
-            flash("Tanggal, tipe, akun kas/bank, akun lawan, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.cash_edit", tx_id=tx_id))
-
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "direction": CASH_DIRECTIONS,
+                "cash_account": "text",
+                "counter_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, tipe, akun kas/bank, akun lawan, dan nominal wajib diisi.",
+        )
+        if form is None:
             return redirect(url_for("main.cash_edit", tx_id=tx_id))
+        tx_date, direction, cash_code, counter_code, amount, memo = form
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
-        counter_acc = Account.query.filter_by(access_code_id=acc.id, code=counter_code).first()
+        tx = _scoped_or_404(CashTransaction, acc, tx_id)
+        picked = _load_accounts(acc, {cash_code, counter_code})
+        cash_acc = picked.get(cash_code)
+        counter_acc = picked.get(counter_code)
         if not cash_acc or not counter_acc:
             flash("Akun tidak valid.", "error")
             return redirect(url_for("main.cash_edit", tx_id=tx_id))
 
         # UPDATE transaksi dulu
-        tx.date = _parse_date(date_str)
+        tx.date = tx_date
         tx.direction = direction
         tx.cash_account_code = cash_acc.code
         tx.cash_account_name = cash_acc.name
@@ -1335,8 +1682,6 @@ def cash_edit(tx_id: int):
         tx.amount = amount
         tx.memo = memo or None
 
-        db.session.flush()
-
         # Rebuild jurnal TANPA delete journal entry (hindari FK violation)
         _rebuild_journal_for_cash(acc, tx)
 
@@ -1344,6 +1689,8 @@ def cash_edit(tx_id: int):
         flash("Transaksi kas berhasil diupdate.", "success")
         return redirect(url_for("main.cash_home"))
 
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
+    accounts = _accounts_for(acc)
     return render_template("cash_edit.html", tx=tx, accounts=accounts)
 
 
@@ -1353,16 +1700,9 @@ def cash_delete(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
-
-    # putus FK dulu supaya aman
-    entry_id = getattr(tx, "journal_entry_id", None)
-    if entry_id:
-        tx.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
 
-    db.session.delete(tx)
+    _delete_with_journal(acc, tx)
     db.session.commit()
     flash("Transaksi kas berhasil dihapus.", "success")
     return redirect(url_for("main.cash_home"))
@@ -1372,6 +1712,7 @@ def cash_delete(tx_id: int):
 # Jurnal (dengan filter tanggal) — scoped
 # ============================================================
 @bp.get("/journals")
+@query_budget(2)
 def journals_list():
     acc = _require_access()
     if not acc:
@@ -1380,7 +1721,7 @@ def journals_list():
     dfrom, dto = _get_date_range_from_request()
 
     entries = (
-        JournalEntry.query.filter_by(access_code_id=acc.id)
+        list_query(JournalEntry).filter_by(access_code_id=acc.id)
         .filter(JournalEntry.date >= datetime.combine(dfrom, datetime.min.time()))
         .filter(JournalEntry.date <= datetime.combine(dto, datetime.max.time()))
         .order_by(JournalEntry.date.desc(), JournalEntry.id.desc())
@@ -1396,85 +1737,153 @@ def journals_list():
 
 
 @bp.get("/journals/<int:entry_id>")
+@query_budget(3)
 def journals_detail(entry_id: int):
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    entry = JournalEntry.query.filter_by(id=entry_id, access_code_id=acc.id).first_or_404()
+    entry = (
+        list_query(JournalEntry, JournalEntry.lines)
+        .filter_by(id=entry_id, access_code_id=acc.id)
+        .first_or_404()
+    )
     return render_template("journals_detail.html", entry=entry)
 
 
 # ============================================================
-# Purchase (hutang) — scoped
+# Export Buku Besar (Excel) — scoped
 # ============================================================
-@bp.route("/purchase", methods=["GET", "POST"])
-def purchase_home():
+def _ledger_lines_query(acc: AccessCode, dfrom: date, dto: date, code: str | None = None):
+    """Baris jurnal (tanggal, no jurnal, memo, akun, debit, kredit) dalam rentang."""
+    from_dt, to_dt_excl = _range_bounds(dfrom, dto)
+    q = (
+        db.session.query(
+            JournalEntry.date,
+            JournalEntry.id,
+            JournalEntry.memo,
+            JournalLine.account_code,
+            JournalLine.account_name,
+            JournalLine.debit,
+            JournalLine.credit,
+        )
+        .join(JournalEntry, JournalLine.entry_id == JournalEntry.id)
+        .filter(JournalLine.access_code_id == acc.id)
+        .filter(JournalEntry.date >= from_dt, JournalEntry.date < to_dt_excl)
+    )
+    if code:
+        q = q.filter(JournalLine.account_code == code)
+    return q.order_by(
+        JournalLine.account_code, JournalEntry.date, JournalEntry.id, JournalLine.id
+    )
+
+
+@bp.get("/reports/ledger.xlsx")
+def export_ledger_xlsx():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    suppliers = (
-        Supplier.query.filter_by(access_code_id=acc.id)
-        .order_by(Supplier.name.asc())
-        .all()
-    )
-    items = (
-        Item.query.filter_by(access_code_id=acc.id)
-        .order_by(Item.name.asc())
-        .all()
+    code = (request.args.get("account") or "").strip()
+    if not code:
+        flash("Pilih akun dulu.", "error")
+        return redirect(url_for("main.report_ledger"))
+    dfrom, dto = _get_date_range_from_request()
+
+    def rows():
+        # saldo berjalan dihitung sambil streaming, tidak perlu list penuh
+        balance = 0
+        for d, entry_id, memo, _code, _name, debit, credit in (
+            _ledger_lines_query(acc, dfrom, dto, code).yield_per(500)
+        ):
+            debit, credit = debit or 0, credit or 0
+            balance += debit - credit
+            yield (d.date(), entry_id, memo or "", float(debit), float(credit), float(balance))
+
+    return _xlsx_send(
+        f"buku-besar-{code}-{dfrom:%Y%m%d}-{dto:%Y%m%d}.xlsx",
+        f"Buku Besar {code}",
+        ["Tanggal", "No. Jurnal", "Keterangan", "Debit", "Kredit", "Saldo"],
+        rows(),
+        widths=[12, 11, 40, 16, 16, 16],
     )
 
-    if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        supplier_id = (request.form.get("supplier_id") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
 
-        item_id = (request.form.get("item_id") or "").strip()
-        qty_str = (request.form.get("qty") or "").strip()
-        price_str = (request.form.get("price") or "").strip()
+@bp.get("/reports/ledger-all.xlsx")
+def export_ledger_all_xlsx():
+    acc = _require_access()
+    if not acc:
+        return redirect(url_for("main.enter_code"))
 
-        if not date_str or not item_id or not qty_str or not price_str:
-            flash("Tanggal, bahan, qty, dan harga wajib diisi.", "error")
-            return redirect(url_for("main.purchase_home"))
+    dfrom, dto = _get_date_range_from_request()
+    rows = (
+        (d.date(), entry_id, code, name, memo or "", float(debit or 0), float(credit or 0))
+        for d, entry_id, memo, code, name, debit, credit in (
+            _ledger_lines_query(acc, dfrom, dto).yield_per(500)
+        )
+    )
+    return _xlsx_send(
+        f"buku-besar-{dfrom:%Y%m%d}-{dto:%Y%m%d}.xlsx",
+        "Buku Besar",
+        ["Tanggal", "No. Jurnal", "Kode Akun", "Nama Akun", "Keterangan", "Debit", "Kredit"],
+        rows,
+        widths=[12, 11, 11, 28, 40, 16, 16],
+    )
 
-        try:
-            qty = float(qty_str)
-            price = float(price_str)
-            if qty <= 0 or price <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Qty dan harga harus angka > 0.", "error")
+
+# ============================================================
+# Purchase (hutang) — scoped
+# ============================================================
+@bp.route("/purchase", methods=["GET", "POST"])
+@query_budget(5)
+def purchase_home():
+    acc = _require_access()
+    if not acc:
+        return redirect(url_for("main.enter_code"))
+
+    if request.method == "POST":
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "supplier_id": "id?",
+                "memo": "text?",
+                "item_id": "id",
+                "qty": "number",
+                "price": "number",
+            },
+            "Tanggal, bahan, qty, dan harga wajib diisi.",
+            number_msg="Qty dan harga harus angka > 0.",
+            id_msg="Bahan tidak valid.",
+        )
+        if form is None:
             return redirect(url_for("main.purchase_home"))
+        purchase_date, supplier_id, memo, item_id, qty, price = form
 
-        item = Item.query.filter_by(id=int(item_id), access_code_id=acc.id).first()
-        if not item:
+        found = _purchase_item_and_supplier(acc, item_id, supplier_id)
+        if not found:
             flash("Bahan tidak valid.", "error")
             return redirect(url_for("main.purchase_home"))
+        item, sup_id, sup_name = found
 
         subtotal = qty * price
 
         purchase = Purchase(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=purchase_date,
             total_amount=subtotal,
             memo=memo or None,
+            supplier_id=sup_id,
+            supplier_name=sup_name,
         )
 
-        if supplier_id:
-            supplier = Supplier.query.filter_by(id=int(supplier_id), access_code_id=acc.id).first()
-            if supplier:
-                purchase.supplier_id = supplier.id
-                purchase.supplier_name = supplier.name
-
         db.session.add(purchase)
         db.session.flush()
 
         pitem = PurchaseItem(
             access_code_id=acc.id,
             purchase_id=purchase.id,
-            item_id=item.id,
-            item_name=item.name,
+            item=item,
             qty=qty,
             price=price,
             subtotal=subtotal,
@@ -1482,60 +1891,68 @@ def purchase_home():
         db.session.add(pitem)
 
         # update stok & avg cost (moving average)
-        total_cost_existing = float(item.stock_qty or 0) * float(item.avg_cost or 0)
-        total_cost_new = qty * price
-        new_qty = float(item.stock_qty or 0) + qty
-
-        item.avg_cost = (total_cost_existing + total_cost_new) / new_qty
-        item.stock_qty = new_qty
+        _lock_items(acc, item.id)
+        _apply_purchase_stock(item, qty, price)
 
-        entry = _create_journal_for_purchase(purchase)
+        entry = _create_journal_for_purchase(acc, purchase)
         purchase.journal_entry_id = entry.id
 
         db.session.commit()
         flash("Pembelian tersimpan, stok bertambah, hutang tercatat.", "success")
         return redirect(url_for("main.purchase_home"))
 
-    purchases = (
-        Purchase.query.filter_by(access_code_id=acc.id)
-        .order_by(Purchase.date.desc(), Purchase.id.desc())
-        .limit(20)
-        .all()
+    # dropdown cuma dibutuhkan saat render form (GET)
+    suppliers, items = _purchase_form_options(acc)
+    purchases, pager = _paginate(
+        db.session.query(*_PURCHASE_LIST_COLS)
+        .filter(Purchase.access_code_id == acc.id)
+        .order_by(Purchase.date.desc(), Purchase.id.desc()),
+        per_page=20,
+    )
+    return render_template(
+        "purchase_home.html", suppliers=suppliers, items=items, purchases=purchases, pager=pager
     )
-    return render_template("purchase_home.html", suppliers=suppliers, items=items, purchases=purchases)
 
 
 # ============================================================
 # PURCHASE: Helpers reverse/apply stok + rebuild jurnal (scoped)
 # ============================================================
-def _reverse_purchase_stock(acc: AccessCode, pitem: PurchaseItem):
-    item = Item.query.filter_by(id=pitem.item_id, access_code_id=acc.id).first()
-    if not item:
+def _lock_items(acc: AccessCode, *item_ids: int | None):
+    """
+    Postgres: kunci advisory per (dapur, bahan) sampai commit/rollback, supaya
+    cek stok + baca avg_cost + tulis stok di request lain untuk bahan yang sama
+    menunggu. Diurutkan supaya dua request yang mengunci 2 bahan tidak deadlock.
+    SQLite (lokal): penulis sudah diserialkan oleh file lock DB, jadi no-op.
+    """
+    if db.session.get_bind().dialect.name != "postgresql":
         return
+    for item_id in sorted({i for i in item_ids if i}):
+        db.session.execute(select(func.pg_advisory_xact_lock(acc.id, item_id)))
+
 
+def _reverse_purchase_stock(acc: AccessCode, pitem: PurchaseItem):
     old_qty = float(pitem.qty or 0)
     old_price = float(pitem.price or 0)
     if old_qty <= 0:
         return
 
-    cur_qty = float(item.stock_qty or 0)
-    cur_avg = float(item.avg_cost or 0)
-
-    total_cost_cur = cur_qty * cur_avg
-    total_cost_old = old_qty * old_price
-
-    new_qty = cur_qty - old_qty
-    if new_qty <= 0:
-        item.stock_qty = 0.0
-        item.avg_cost = 0.0
-        return
-
-    new_total_cost = total_cost_cur - total_cost_old
-    if new_total_cost < 0:
-        new_total_cost = 0.0
-
-    item.stock_qty = new_qty
-    item.avg_cost = new_total_cost / new_qty if new_qty else 0.0
+    # dihitung di DB dari nilai stok saat UPDATE (bukan baca-hitung-tulis di Python),
+    # jadi dua request bersamaan tidak saling menimpa; tanpa SELECT bahan dulu
+    new_qty = Item.stock_qty - old_qty
+    new_total_cost = Item.stock_qty * Item.avg_cost - old_qty * old_price
+    db.session.execute(
+        update(Item)
+        .where(Item.id == pitem.item_id, Item.access_code_id == acc.id)
+        .values(
+            stock_qty=case((new_qty > 0, new_qty), else_=0),
+            avg_cost=case(
+                (new_qty <= 0, 0),
+                (new_total_cost <= 0, 0),
+                else_=new_total_cost / new_qty,
+            ),
+        )
+        .execution_options(synchronize_session="fetch")
+    )
 
 
 def _apply_purchase_stock(item: Item, qty: float, price: float):
@@ -1544,29 +1961,41 @@ def _apply_purchase_stock(item: Item, qty: float, price: float):
     if qty <= 0:
         return
 
-    cur_qty = float(item.stock_qty or 0)
-    cur_avg = float(item.avg_cost or 0)
-
-    total_cost_existing = cur_qty * cur_avg
-    total_cost_new = qty * price
-    new_qty = cur_qty + qty
-
-    item.stock_qty = new_qty
-    item.avg_cost = (total_cost_existing + total_cost_new) / new_qty if new_qty else 0.0
+    # moving average atomik di DB (lihat _reverse_purchase_stock);
+    # atribut item di session di-expire, dibaca ulang kalau dipakai lagi
+    new_qty = Item.stock_qty + qty
+    db.session.execute(
+        update(Item)
+        .where(Item.id == item.id)
+        .values(
+            avg_cost=(Item.stock_qty * Item.avg_cost + qty * price) / new_qty,
+            stock_qty=new_qty,
+        )
+        .execution_options(synchronize_session="fetch")
+    )
 
 
 def _delete_journal_entry_scoped(acc: AccessCode, entry_id: int | None):
     if not entry_id:
         return
-    JournalLine.query.filter_by(access_code_id=acc.id, entry_id=entry_id).delete()
+    # journal_lines ikut terhapus via ON DELETE CASCADE (1 DELETE saja)
     JournalEntry.query.filter_by(access_code_id=acc.id, id=entry_id).delete()
 
 
-def _rebuild_journal_for_purchase(acc: AccessCode, purchase: Purchase):
-    _delete_journal_entry_scoped(acc, getattr(purchase, "journal_entry_id", None))
-    db.session.flush()
-    entry = _create_journal_for_purchase(purchase)
-    purchase.journal_entry_id = entry.id
+def _delete_with_journal(acc: AccessCode, owner) -> None:
+    """
+    Hapus dokumen (kas, pembelian, ...) + jurnalnya lewat dua DELETE langsung.
+    Dokumen dihapus duluan, jadi FK ke journal_entries sudah lepas tanpa
+    UPDATE journal_entry_id = NULL + flush terpisah.
+    """
+    model = type(owner)
+    entry_id = owner.journal_entry_id
+    db.session.execute(delete(model).where(model.access_code_id == acc.id, model.id == owner.id))
+    _delete_journal_entry_scoped(acc, entry_id)
+
+
+def _rebuild_journal_for_purchase(acc: AccessCode, purchase: Purchase) -> JournalEntry:
+    return _rebuild_journal(acc, purchase, _create_journal_for_purchase)
 
 
 # ============================================================
@@ -1578,67 +2007,47 @@ def purchase_edit(purchase_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    purchase = Purchase.query.filter_by(id=purchase_id, access_code_id=acc.id).first_or_404()
-
-    pitem = PurchaseItem.query.filter_by(
-        access_code_id=acc.id,
-        purchase_id=purchase.id,
-    ).first()
-    if not pitem:
-        flash("Item pembelian tidak ditemukan.", "error")
-        return redirect(url_for("main.purchase_home"))
-
-    suppliers = Supplier.query.filter_by(access_code_id=acc.id).order_by(Supplier.name.asc()).all()
-    items = Item.query.filter_by(access_code_id=acc.id).order_by(Item.name.asc()).all()
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        supplier_id = (request.form.get("supplier_id") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        item_id = (request.form.get("item_id") or "").strip()
-        qty_str = (request.form.get("qty") or "").strip()
-        price_str = (request.form.get("price") or "").strip()
-
-        if not date_str or not item_id or not qty_str or not price_str:
-            flash("Tanggal, bahan, qty, dan harga wajib diisi.", "error")
-            return redirect(url_for("main.purchase_edit", purchase_id=purchase.id))
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "supplier_id": "id?",
+                "memo": "text?",
+                "item_id": "id",
+                "qty": "number",
+                "price": "number",
+            },
+            "Tanggal, bahan, qty, dan harga wajib diisi.",
+            number_msg="Qty dan harga harus angka > 0.",
+            id_msg="Bahan tidak valid.",
+        )
+        if form is None:
+            return redirect(url_for("main.purchase_edit", purchase_id=purchase_id))
+        purchase_date, supplier_id, memo, item_id, qty, price = form
 
-        try:
-            qty = float(qty_str)
-            price = float(price_str)
-            if qty <= 0 or price <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Qty dan harga harus angka > 0.", "error")
-            return redirect(url_for("main.purchase_edit", purchase_id=purchase.id))
+        purchase, pitem = _purchase_with_item(acc, purchase_id)
+        if not pitem:
+            flash("Item pembelian tidak ditemukan.", "error")
+            return redirect(url_for("main.purchase_home"))
 
-        new_item = Item.query.filter_by(id=int(item_id), access_code_id=acc.id).first()
-        if not new_item:
+        found = _purchase_item_and_supplier(acc, item_id, supplier_id)
+        if not found:
             flash("Bahan tidak valid.", "error")
             return redirect(url_for("main.purchase_edit", purchase_id=purchase.id))
+        new_item, sup_id, sup_name = found
 
         # STEP 1: reverse stok dari pembelian lama
+        _lock_items(acc, pitem.item_id, new_item.id)
         _reverse_purchase_stock(acc, pitem)
 
         # STEP 2: update purchase + pitem
-        purchase.date = _parse_date(date_str)
+        purchase.date = purchase_date
         purchase.memo = memo or None
+        purchase.supplier_id = sup_id
+        purchase.supplier_name = sup_name
 
-        if supplier_id:
-            sup = Supplier.query.filter_by(id=int(supplier_id), access_code_id=acc.id).first()
-            if sup:
-                purchase.supplier_id = sup.id
-                purchase.supplier_name = sup.name
-            else:
-                purchase.supplier_id = None
-                purchase.supplier_name = None
-        else:
-            purchase.supplier_id = None
-            purchase.supplier_name = None
-
-        pitem.item_id = new_item.id
-        pitem.item_name = new_item.name
+        pitem.item = new_item
         pitem.qty = qty
         pitem.price = price
         pitem.subtotal = qty * price
@@ -1654,6 +2063,12 @@ def purchase_edit(purchase_id: int):
         flash("Pembelian berhasil diupdate. Stok & jurnal sudah disesuaikan.", "success")
         return redirect(url_for("main.purchase_home"))
 
+    purchase, pitem = _purchase_with_item(acc, purchase_id)
+    if not pitem:
+        flash("Item pembelian tidak ditemukan.", "error")
+        return redirect(url_for("main.purchase_home"))
+
+    suppliers, items = _purchase_form_options(acc)
     return render_template(
         "purchase_edit.html",
         purchase=purchase,
@@ -1669,23 +2084,18 @@ def purchase_delete(purchase_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    purchase = Purchase.query.filter_by(id=purchase_id, access_code_id=acc.id).first_or_404()
-    pitem = PurchaseItem.query.filter_by(access_code_id=acc.id, purchase_id=purchase.id).first()
+    purchase, pitem = _purchase_with_item(acc, purchase_id)
 
     if pitem:
+        _lock_items(acc, pitem.item_id)
         _reverse_purchase_stock(acc, pitem)
 
-    # putus FK dulu baru delete entry
-    entry_id = getattr(purchase, "journal_entry_id", None)
-    if entry_id:
-        purchase.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
-
-    if pitem:
-        db.session.delete(pitem)
-
-    db.session.delete(purchase)
+    db.session.execute(
+        delete(PurchaseItem).where(
+            PurchaseItem.access_code_id == acc.id, PurchaseItem.purchase_id == purchase.id
+        )
+    )
+    _delete_with_journal(acc, purchase)
     db.session.commit()
 
     flash("Pembelian dihapus. Stok & jurnal sudah dikembalikan.", "success")
@@ -1695,51 +2105,48 @@ def purchase_delete(purchase_id: int):
 # ============================================================
 # AP Payment (scoped)
 # ============================================================
+def _set_purchase_paid(acc: AccessCode, purchase_id: int, paid: bool):
+    # status lunas ditulis lewat UPDATE langsung, tanpa load objek Purchase
+    db.session.execute(
+        update(Purchase)
+        .where(Purchase.id == purchase_id, Purchase.access_code_id == acc.id)
+        .values(is_paid=paid)
+        .execution_options(synchronize_session=False)
+    )
+
+
 @bp.route("/ap-payment", methods=["GET", "POST"])
+@query_budget(5)
 def ap_payment_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    purchases = (
-        Purchase.query.filter_by(access_code_id=acc.id)
-        .order_by(Purchase.date.desc(), Purchase.id.desc())
-        .all()
-    )
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type == "Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        purchase_id = (request.form.get("purchase_id") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not cash_code or not amount_str:
-            flash("Tanggal, akun kas, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.ap_payment_home"))
-
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "purchase_id": "id?",
+                "cash_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun kas, dan nominal wajib diisi.",
+            id_msg="Pembelian tidak valid.",
+        )
+        if form is None:
             return redirect(url_for("main.ap_payment_home"))
+        pay_date, purchase_id, cash_code, amount, memo = form
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
+        cash_acc = _get_account(acc, cash_code)
         if not cash_acc:
             flash("Akun kas/bank tidak valid.", "error")
             return redirect(url_for("main.ap_payment_home"))
 
         payment = APayment(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=pay_date,
             amount=amount,
             cash_account_code=cash_acc.code,
             cash_account_name=cash_acc.name,
@@ -1747,34 +2154,48 @@ def ap_payment_home():
         )
 
         if purchase_id:
-            purchase = Purchase.query.filter_by(id=int(purchase_id), access_code_id=acc.id).first()
+            # cukup 2 kolom yang dibaca; status lunas ditulis lewat UPDATE langsung
+            purchase = db.session.execute(
+                select(Purchase.supplier_name, Purchase.total_amount)
+                .where(Purchase.id == purchase_id, Purchase.access_code_id == acc.id)
+            ).first()
             if purchase:
-                payment.purchase_id = purchase.id
+                payment.purchase_id = purchase_id
                 payment.supplier_name = purchase.supplier_name
                 if amount >= float(purchase.total_amount or 0):
-                    purchase.is_paid = True
+                    _set_purchase_paid(acc, purchase_id, True)
 
         db.session.add(payment)
         db.session.flush()
 
-        entry = _create_journal_for_ap_payment(payment)
+        entry = _create_journal_for_ap_payment(acc, payment)
         payment.journal_entry_id = entry.id
 
         db.session.commit()
         flash("Pembayaran hutang berhasil dicatat.", "success")
         return redirect(url_for("main.ap_payment_home"))
 
-    payments = (
-        APayment.query.filter_by(access_code_id=acc.id)
-        .order_by(APayment.date.desc(), APayment.id.desc())
-        .limit(20)
+    payments, pager = _paginate(
+        db.session.query(*_AP_PAYMENT_LIST_COLS)
+        .filter(APayment.access_code_id == acc.id)
+        .order_by(APayment.date.desc(), APayment.id.desc()),
+        per_page=20,
+    )
+    # dropdown cuma dibutuhkan saat render form (GET)
+    purchases = (
+        db.session.query(*_PURCHASE_OPTION_COLS)
+        .filter(Purchase.access_code_id == acc.id)
+        .order_by(Purchase.date.desc(), Purchase.id.desc())
+        .limit(_OPTION_LIMIT)
         .all()
     )
+    cash_accounts = _accounts_of_type(acc, "Kas & Bank")
     return render_template(
         "ap_payment_home.html",
         purchases=purchases,
         cash_accounts=cash_accounts,
         payments=payments,
+        pager=pager,
     )
 
 
@@ -1784,80 +2205,73 @@ def ap_payment_edit(payment_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    payment = APayment.query.filter_by(id=payment_id, access_code_id=acc.id).first_or_404()
-
-    purchases = Purchase.query.filter_by(access_code_id=acc.id).order_by(Purchase.date.desc()).all()
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type == "Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        purchase_id = (request.form.get("purchase_id") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not cash_code or not amount_str:
-            flash("Tanggal, akun kas, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.ap_payment_edit", payment_id=payment.id))
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "purchase_id": "id?",
+                "cash_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun kas, dan nominal wajib diisi.",
+            id_msg="Pembelian tidak valid.",
+        )
+        if form is None:
+            return redirect(url_for("main.ap_payment_edit", payment_id=payment_id))
+        pay_date, purchase_id, cash_code, amount, memo = form
 
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
-            return redirect(url_for("main.ap_payment_edit", payment_id=payment.id))
+        payment = _scoped_or_404(APayment, acc, payment_id)
+        # akun dicek dulu: kalau tidak valid, belum ada flush/DELETE jurnal yang terbuang
+        cash_acc = _get_account(acc, cash_code)
+        if not cash_acc:
+            flash("Akun kas/bank tidak valid.", "error")
+            return redirect(url_for("main.ap_payment_edit", payment_id=payment_id))
 
         # rollback status pembelian lama
         if payment.purchase_id:
-            old_purchase = Purchase.query.filter_by(id=payment.purchase_id, access_code_id=acc.id).first()
-            if old_purchase:
-                old_purchase.is_paid = False
-
-        # hapus jurnal lama dengan aman (putus FK dulu)
-        old_entry_id = getattr(payment, "journal_entry_id", None)
-        if old_entry_id:
-            payment.journal_entry_id = None
-            db.session.flush()
-            _delete_journal_entry_scoped(acc, old_entry_id)
-            db.session.flush()
+            _set_purchase_paid(acc, payment.purchase_id, False)
 
         # update payment
-        payment.date = _parse_date(date_str)
+        payment.date = pay_date
         payment.amount = amount
         payment.memo = memo or None
-
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
-        if not cash_acc:
-            flash("Akun kas/bank tidak valid.", "error")
-            return redirect(url_for("main.ap_payment_edit", payment_id=payment.id))
-
         payment.cash_account_code = cash_acc.code
         payment.cash_account_name = cash_acc.name
 
         if purchase_id:
-            purchase = Purchase.query.filter_by(id=int(purchase_id), access_code_id=acc.id).first()
+            # cukup 2 kolom yang dibaca, sama seperti input baru
+            purchase = db.session.execute(
+                select(Purchase.supplier_name, Purchase.total_amount)
+                .where(Purchase.id == purchase_id, Purchase.access_code_id == acc.id)
+            ).first()
             if purchase:
-                payment.purchase_id = purchase.id
+                payment.purchase_id = purchase_id
                 payment.supplier_name = purchase.supplier_name
                 if amount >= float(purchase.total_amount or 0):
-                    purchase.is_paid = True
+                    _set_purchase_paid(acc, purchase_id, True)
         else:
             payment.purchase_id = None
             payment.supplier_name = None
 
-        entry = _create_journal_for_ap_payment(payment)
-        payment.journal_entry_id = entry.id
+        # entry lama ditulis ulang di tempat (tanpa putus FK + DELETE + INSERT)
+        _rebuild_journal(acc, payment, _create_journal_for_ap_payment)
 
         db.session.commit()
         flash("Pembayaran hutang berhasil diupdate.", "success")
         return redirect(url_for("main.ap_payment_home"))
 
+    payment = _scoped_or_404(APayment, acc, payment_id)
+    # dropdown cuma dibutuhkan saat render form (GET)
+    # form edit tanpa limit: pembelian yang sedang terpilih harus tetap ada di pilihan
+    purchases = (
+        db.session.query(*_PURCHASE_OPTION_COLS)
+        .filter(Purchase.access_code_id == acc.id)
+        .order_by(Purchase.date.desc())
+        .all()
+    )
+    cash_accounts = _accounts_of_type(acc, "Kas & Bank")
     return render_template(
         "ap_payment_edit.html",
         payment=payment,
@@ -1872,22 +2286,13 @@ def ap_payment_delete(payment_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    payment = APayment.query.filter_by(id=payment_id, access_code_id=acc.id).first_or_404()
+    payment = _scoped_or_404(APayment, acc, payment_id)
 
     # rollback status hutang
     if payment.purchase_id:
-        purchase = Purchase.query.filter_by(id=payment.purchase_id, access_code_id=acc.id).first()
-        if purchase:
-            purchase.is_paid = False
-
-    # putus FK dulu baru delete entry
-    entry_id = getattr(payment, "journal_entry_id", None)
-    if entry_id:
-        payment.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
+        _set_purchase_paid(acc, payment.purchase_id, False)
 
-    db.session.delete(payment)
+    _delete_with_journal(acc, payment)
     db.session.commit()
 
     flash("Pembayaran hutang dihapus. Jurnal & status hutang dikembalikan.", "success")
@@ -1895,7 +2300,7 @@ def ap_payment_delete(payment_id: int):
 
 
 # ============================================================
-# Sales (SIMPLE) — pakai CashTransaction memo [SALE] (scoped)
+# Sales (SIMPLE) — CashTransaction kind="sale", memo tetap diawali [SALE] (scoped)
 # ============================================================
 def _sale_memo(customer: str | None, note: str | None) -> str:
     customer = (customer or "").strip()
@@ -1910,54 +2315,41 @@ def _sale_memo(customer: str | None, note: str | None) -> str:
 
 
 @bp.route("/sales", methods=["GET", "POST"])
+@query_budget(4)
 def sales_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    debit_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Kas & Bank", "Akun Piutang"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-    revenue_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Pendapatan", "Pendapatan Lain"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        customer = (request.form.get("customer_name") or "").strip()
-        debit_code = (request.form.get("debit_account") or "").strip()
-        credit_code = (request.form.get("revenue_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        note = (request.form.get("memo") or "").strip()
-
-        if not date_str or not debit_code or not credit_code or not amount_str:
-            flash("Tanggal, akun debit, akun pendapatan, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.sales_home"))
-
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "customer_name": "text?",
+                "debit_account": "text",
+                "revenue_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun debit, akun pendapatan, dan nominal wajib diisi.",
+        )
+        if form is None:
             return redirect(url_for("main.sales_home"))
+        tx_date, customer, debit_code, credit_code, amount, note = form
 
-        debit_acc = Account.query.filter_by(access_code_id=acc.id, code=debit_code).first()
-        credit_acc = Account.query.filter_by(access_code_id=acc.id, code=credit_code).first()
+        found = _load_accounts(acc, (debit_code, credit_code))
+        debit_acc = found.get(debit_code)
+        credit_acc = found.get(credit_code)
         if not debit_acc or not credit_acc:
             flash("Akun tidak valid.", "error")
             return redirect(url_for("main.sales_home"))
 
         tx = CashTransaction(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=tx_date,
             direction="in",
+            kind="sale",
             cash_account_code=debit_acc.code,
             cash_account_name=debit_acc.name,
             counter_account_code=credit_acc.code,
@@ -1974,21 +2366,24 @@ def sales_home():
         flash("Penjualan tersimpan & jurnal otomatis dibuat.", "success")
         return redirect(url_for("main.sales_home"))
 
-    sales = (
-        CashTransaction.query.filter_by(access_code_id=acc.id)
-        .filter(CashTransaction.direction == "in")
-        .filter(CashTransaction.memo.like("[SALE]%"))
-        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc())
-        .limit(100)
-        .all()
+    sales, pager = _paginate(
+        db.session.query(*_CASH_LIST_COLS)
+        .filter(CashTransaction.access_code_id == acc.id)
+        .filter(CashTransaction.kind == "sale", CashTransaction.direction == "in")
+        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc()),
+        per_page=100,
     )
 
+    # dropdown cuma dibutuhkan saat render form (GET)
+    debit_accounts = _accounts_of_type(acc, "Kas & Bank", "Akun Piutang")
+    revenue_accounts = _accounts_of_type(acc, "Pendapatan", "Pendapatan Lain")
     return render_template(
         "sales_home.html",
         debit_accounts=debit_accounts,
         revenue_accounts=revenue_accounts,
         sales=sales,
-        today=datetime.utcnow().strftime("%Y-%m-%d"),
+        pager=pager,
+        today=_request_now().strftime("%Y-%m-%d"),
     )
 
 
@@ -1998,53 +2393,37 @@ def sales_edit(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
-
-    if not (tx.direction == "in" and (tx.memo or "").startswith("[SALE]")):
-        flash("Transaksi ini bukan penjualan.", "error")
-        return redirect(url_for("main.sales_home"))
-
-    debit_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Kas & Bank", "Akun Piutang"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-    revenue_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Pendapatan", "Pendapatan Lain"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        customer = (request.form.get("customer_name") or "").strip()
-        debit_code = (request.form.get("debit_account") or "").strip()
-        credit_code = (request.form.get("revenue_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        note = (request.form.get("memo") or "").strip()
-
-        if not date_str or not debit_code or not credit_code or not amount_str:
-            flash("Tanggal, akun debit, akun pendapatan, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.sales_edit", tx_id=tx.id))
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "customer_name": "text?",
+                "debit_account": "text",
+                "revenue_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun debit, akun pendapatan, dan nominal wajib diisi.",
+        )
+        if form is None:
+            return redirect(url_for("main.sales_edit", tx_id=tx_id))
+        tx_date, customer, debit_code, credit_code, amount, note = form
 
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
-            return redirect(url_for("main.sales_edit", tx_id=tx.id))
+        tx = _scoped_or_404(CashTransaction, acc, tx_id)
+        if not (tx.direction == "in" and tx.kind == "sale"):
+            flash("Transaksi ini bukan penjualan.", "error")
+            return redirect(url_for("main.sales_home"))
 
-        debit_acc = Account.query.filter_by(access_code_id=acc.id, code=debit_code).first()
-        credit_acc = Account.query.filter_by(access_code_id=acc.id, code=credit_code).first()
+        found = _load_accounts(acc, (debit_code, credit_code))
+        debit_acc = found.get(debit_code)
+        credit_acc = found.get(credit_code)
         if not debit_acc or not credit_acc:
             flash("Akun tidak valid.", "error")
-            return redirect(url_for("main.sales_edit", tx_id=tx.id))
+            return redirect(url_for("main.sales_edit", tx_id=tx_id))
 
         # UPDATE transaksi (ini yang sebelumnya belum kamu lakukan)
-        tx.date = _parse_date(date_str)
+        tx.date = tx_date
         tx.direction = "in"
         tx.cash_account_code = debit_acc.code
         tx.cash_account_name = debit_acc.name
@@ -2053,8 +2432,6 @@ def sales_edit(tx_id: int):
         tx.amount = amount
         tx.memo = _sale_memo(customer, note)
 
-        db.session.flush()
-
         # Rebuild jurnal TANPA delete entry
         _rebuild_journal_for_cash(acc, tx)
 
@@ -2062,7 +2439,15 @@ def sales_edit(tx_id: int):
         flash("Penjualan berhasil diupdate.", "success")
         return redirect(url_for("main.sales_home"))
 
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
+    if not (tx.direction == "in" and tx.kind == "sale"):
+        flash("Transaksi ini bukan penjualan.", "error")
+        return redirect(url_for("main.sales_home"))
+
     raw = (tx.memo or "").replace("[SALE]", "").strip()
+    # dropdown cuma dibutuhkan saat render form (GET)
+    debit_accounts = _accounts_of_type(acc, "Kas & Bank", "Akun Piutang")
+    revenue_accounts = _accounts_of_type(acc, "Pendapatan", "Pendapatan Lain")
     return render_template(
         "sales_edit.html",
         tx=tx,
@@ -2078,19 +2463,13 @@ def sales_delete(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
 
-    if not (tx.direction == "in" and (tx.memo or "").startswith("[SALE]")):
+    if not (tx.direction == "in" and tx.kind == "sale"):
         flash("Transaksi ini bukan penjualan.", "error")
         return redirect(url_for("main.sales_home"))
 
-    entry_id = getattr(tx, "journal_entry_id", None)
-    if entry_id:
-        tx.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
-
-    db.session.delete(tx)
+    _delete_with_journal(acc, tx)
     db.session.commit()
 
     flash("Penjualan dihapus.", "success")
@@ -2101,94 +2480,109 @@ def sales_delete(tx_id: int):
 # AR Payments (Invoice) — scoped (route kamu /ar/payments)
 # ============================================================
 @bp.route("/ar/payments", methods=["GET", "POST"])
+@query_budget(6)
 def ar_payment_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type == "Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-    open_invoices = (
-        SalesInvoice.query.filter_by(access_code_id=acc.id)
-        .filter(SalesInvoice.status != "paid")
-        .order_by(SalesInvoice.date.desc(), SalesInvoice.id.desc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        invoice_id = (request.form.get("invoice_id") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not invoice_id or not cash_code or not amount_str:
-            flash("Tanggal, invoice, akun kas/bank, dan nominal wajib diisi.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "invoice_id": "id",
+                "cash_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, invoice, akun kas/bank, dan nominal wajib diisi.",
+            id_msg="Invoice tidak ditemukan.",
+        )
+        if form is None:
             return redirect(url_for("main.ar_payment_home"))
+        pay_date, invoice_id, cash_code, amt, memo = form
 
-        inv = SalesInvoice.query.filter_by(id=int(invoice_id), access_code_id=acc.id).first()
+        # proyeksi kolom yang dipakai (validasi sisa + jurnal), bukan objek penuh
+        inv = db.session.execute(
+            select(*_AR_PAYMENT_INVOICE_COLS).where(
+                SalesInvoice.id == invoice_id, SalesInvoice.access_code_id == acc.id
+            )
+        ).first()
         if not inv:
             flash("Invoice tidak ditemukan.", "error")
             return redirect(url_for("main.ar_payment_home"))
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
+        cash_acc = _get_account(acc, cash_code)
         if not cash_acc:
             flash("Akun kas/bank tidak valid.", "error")
             return redirect(url_for("main.ar_payment_home"))
 
-        try:
-            amt = float(amount_str)
-            if amt <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
-            return redirect(url_for("main.ar_payment_home"))
-
-        remaining = float(inv.total_amount or 0) - float(inv.paid_amount or 0)
+        inv_total = float(inv.total_amount or 0)
+        inv_paid = float(inv.paid_amount or 0)
+        remaining = inv_total - inv_paid
         if amt > remaining:
             flash(f"Nominal melebihi sisa piutang (sisa: Rp {remaining:,.0f}).", "error")
             return redirect(url_for("main.ar_payment_home"))
 
         pay = ARPayment(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=pay_date,
             invoice_id=inv.id,
-            invoice_no=inv.invoice_no,
             cash_account_code=cash_acc.code,
             cash_account_name=cash_acc.name,
             amount=amt,
             memo=memo or None,
         )
         db.session.add(pay)
+        # flush ini perlu: source_id entry jurnal = pay.id (bukan flush dobel,
+        # _post_journal hanya flush entry-nya sendiri)
         db.session.flush()
 
-        entry = _create_journal_for_ar_payment(pay, inv)
+        entry = _create_journal_for_ar_payment(acc, pay, inv)
         pay.journal_entry_id = entry.id
 
-        inv.paid_amount = float(inv.paid_amount or 0) + amt
-        if inv.paid_amount >= float(inv.total_amount or 0):
-            inv.status = "paid"
-            inv.paid_amount = float(inv.total_amount or 0)
-        else:
-            inv.status = "partial"
+        # status & paid_amount dihitung DB dari nilai saat UPDATE (aman kalau ada
+        # pembayaran lain untuk invoice yang sama di request paralel)
+        paid = SalesInvoice.paid_amount + amt
+        lunas = paid >= SalesInvoice.total_amount
+        status_type = SalesInvoice.__table__.c.status.type
+        db.session.execute(
+            update(SalesInvoice)
+            .where(SalesInvoice.id == inv.id, SalesInvoice.access_code_id == acc.id)
+            .values(
+                status=case(
+                    (lunas, literal("paid", status_type)), else_=literal("partial", status_type)
+                ),
+                paid_amount=case((lunas, SalesInvoice.total_amount), else_=paid),
+            )
+            .execution_options(synchronize_session=False)
+        )
 
         db.session.commit()
         flash("Pembayaran piutang tersimpan & jurnal otomatis dibuat.", "success")
         return redirect(url_for("main.ar_payment_home"))
 
-    payments = (
-        ARPayment.query.filter_by(access_code_id=acc.id)
-        .order_by(ARPayment.date.desc(), ARPayment.id.desc())
-        .limit(50)
+    # dropdown cuma dibutuhkan saat render form (GET)
+    cash_accounts = _accounts_of_type(acc, "Kas & Bank")
+    open_invoices = (
+        db.session.query(*_INVOICE_OPTION_COLS)
+        .filter(SalesInvoice.access_code_id == acc.id, SalesInvoice.status != "paid")
+        .order_by(SalesInvoice.date.desc(), SalesInvoice.id.desc())
+        .limit(_OPTION_LIMIT)
         .all()
     )
+
+    # invoice di-selectin sekaligus, relasi lain raiseload (cegah N+1 di template)
+    payments, pager = _paginate(
+        list_query(ARPayment, ARPayment.invoice).filter_by(access_code_id=acc.id)
+        .order_by(ARPayment.date.desc(), ARPayment.id.desc()),
+        per_page=50,
+    )
     return render_template(
         "ar_payment_home.html",
         payments=payments,
+        pager=pager,
         cash_accounts=cash_accounts,
         open_invoices=open_invoices,
     )
@@ -2198,52 +2592,38 @@ def ar_payment_home():
 # Expenses (kas keluar ke akun beban) — scoped
 # ============================================================
 @bp.route("/expenses", methods=["GET", "POST"])
+@query_budget(4)
 def expenses_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type == "Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-    expense_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Beban", "Beban Lain"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        exp_code = (request.form.get("expense_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not cash_code or not exp_code or not amount_str:
-            flash("Tanggal, akun kas, akun beban, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.expenses_home"))
-
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "cash_account": "text",
+                "expense_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun kas, akun beban, dan nominal wajib diisi.",
+        )
+        if form is None:
             return redirect(url_for("main.expenses_home"))
+        tx_date, cash_code, exp_code, amount, memo = form
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
-        exp_acc = Account.query.filter_by(access_code_id=acc.id, code=exp_code).first()
+        picked = _load_accounts(acc, {cash_code, exp_code})
+        cash_acc = picked.get(cash_code)
+        exp_acc = picked.get(exp_code)
         if not cash_acc or not exp_acc:
             flash("Akun tidak valid.", "error")
             return redirect(url_for("main.expenses_home"))
 
         tx = CashTransaction(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
+            date=tx_date,
             direction="out",
             cash_account_code=cash_acc.code,
             cash_account_name=cash_acc.name,
@@ -2261,13 +2641,20 @@ def expenses_home():
         flash("Biaya operasional tersimpan & jurnal dibuat.", "success")
         return redirect(url_for("main.expenses_home"))
 
-    txs = (
-        CashTransaction.query.filter_by(access_code_id=acc.id, direction="out")
-        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc())
-        .limit(50)
-        .all()
+    txs, pager = _paginate(
+        db.session.query(*_CASH_LIST_COLS)
+        .filter(CashTransaction.access_code_id == acc.id, CashTransaction.direction == "out")
+        .order_by(CashTransaction.date.desc(), CashTransaction.id.desc()),
+        per_page=50,
+    )
+    cash_accounts, expense_accounts = _expense_account_options(acc)
+    return render_template(
+        "expenses_home.html",
+        cash_accounts=cash_accounts,
+        expense_accounts=expense_accounts,
+        txs=txs,
+        pager=pager,
     )
-    return render_template("expenses_home.html", cash_accounts=cash_accounts, expense_accounts=expense_accounts, txs=txs)
 
 
 @bp.route("/expenses/<int:tx_id>/edit", methods=["GET", "POST"])
@@ -2276,51 +2663,36 @@ def expense_edit(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
-    if tx.direction != "out":
-        flash("Transaksi ini bukan transaksi biaya.", "error")
-        return redirect(url_for("main.expenses_home"))
-
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type == "Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-    expense_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["Beban", "Beban Lain"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        exp_code = (request.form.get("expense_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not cash_code or not exp_code or not amount_str:
-            flash("Tanggal, akun kas, akun beban, dan nominal wajib diisi.", "error")
-            return redirect(url_for("main.expense_edit", tx_id=tx.id))
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "cash_account": "text",
+                "expense_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Tanggal, akun kas, akun beban, dan nominal wajib diisi.",
+        )
+        if form is None:
+            return redirect(url_for("main.expense_edit", tx_id=tx_id))
+        tx_date, cash_code, exp_code, amount, memo = form
 
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
-            return redirect(url_for("main.expense_edit", tx_id=tx.id))
+        tx = _scoped_or_404(CashTransaction, acc, tx_id)
+        if tx.direction != "out":
+            flash("Transaksi ini bukan transaksi biaya.", "error")
+            return redirect(url_for("main.expenses_home"))
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
-        exp_acc = Account.query.filter_by(access_code_id=acc.id, code=exp_code).first()
+        picked = _load_accounts(acc, {cash_code, exp_code})
+        cash_acc = picked.get(cash_code)
+        exp_acc = picked.get(exp_code)
         if not cash_acc or not exp_acc:
             flash("Akun tidak valid.", "error")
-            return redirect(url_for("main.expense_edit", tx_id=tx.id))
+            return redirect(url_for("main.expense_edit", tx_id=tx_id))
 
         # update transaksi
-        tx.date = _parse_date(date_str)
+        tx.date = tx_date
         tx.direction = "out"
         tx.cash_account_code = cash_acc.code
         tx.cash_account_name = cash_acc.name
@@ -2329,8 +2701,6 @@ def expense_edit(tx_id: int):
         tx.amount = amount
         tx.memo = memo or None
 
-        db.session.flush()
-
         # rebuild jurnal TANPA delete entry
         _rebuild_journal_for_cash(acc, tx)
 
@@ -2338,6 +2708,12 @@ def expense_edit(tx_id: int):
         flash("Transaksi biaya berhasil diupdate.", "success")
         return redirect(url_for("main.expenses_home"))
 
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
+    if tx.direction != "out":
+        flash("Transaksi ini bukan transaksi biaya.", "error")
+        return redirect(url_for("main.expenses_home"))
+
+    cash_accounts, expense_accounts = _expense_account_options(acc)
     return render_template(
         "expense_edit.html",
         tx=tx,
@@ -2352,18 +2728,12 @@ def expense_delete(tx_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    tx = CashTransaction.query.filter_by(id=tx_id, access_code_id=acc.id).first_or_404()
+    tx = _scoped_or_404(CashTransaction, acc, tx_id)
     if tx.direction != "out":
         flash("Transaksi ini bukan transaksi biaya.", "error")
         return redirect(url_for("main.expenses_home"))
 
-    entry_id = getattr(tx, "journal_entry_id", None)
-    if entry_id:
-        tx.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
-
-    db.session.delete(tx)
+    _delete_with_journal(acc, tx)
     db.session.commit()
     flash("Transaksi biaya berhasil dihapus.", "success")
     return redirect(url_for("main.expenses_home"))
@@ -2373,39 +2743,33 @@ def expense_delete(tx_id: int):
 # Stock Usage — scoped
 # ============================================================
 @bp.route("/stock-usage", methods=["GET", "POST"])
+@query_budget(6)
 def stock_usage_home():
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    items = Item.query.filter_by(access_code_id=acc.id).order_by(Item.name.asc()).all()
-    hpp_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["HPP", "Beban"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        item_id = (request.form.get("item_id") or "").strip()
-        qty_str = (request.form.get("qty") or "").strip()
-        hpp_code = (request.form.get("hpp_account") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not item_id or not qty_str or not hpp_code:
-            flash("Tanggal, bahan, qty, dan akun HPP wajib diisi.", "error")
-            return redirect(url_for("main.stock_usage_home"))
-
-        try:
-            qty = float(qty_str)
-            if qty <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Qty harus angka > 0.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "item_id": "id",
+                "qty": "number",
+                "hpp_account": "text",
+                "memo": "text?",
+            },
+            "Tanggal, bahan, qty, dan akun HPP wajib diisi.",
+            number_msg="Qty harus angka > 0.",
+            id_msg="Bahan tidak valid.",
+        )
+        if form is None:
             return redirect(url_for("main.stock_usage_home"))
+        usage_date, item_id, qty, hpp_code, memo = form
 
-        item = Item.query.filter_by(id=int(item_id), access_code_id=acc.id).first()
+        # kunci dulu baru baca stok/avg_cost, jadi cek stok di bawah tidak basi
+        _lock_items(acc, item_id)
+        item = _scoped_get(Item, acc, item_id)
         if not item:
             flash("Bahan tidak valid.", "error")
             return redirect(url_for("main.stock_usage_home"))
@@ -2414,7 +2778,7 @@ def stock_usage_home():
             flash(f"Stok tidak cukup. Stok saat ini: {item.stock_qty:g} {item.unit}.", "error")
             return redirect(url_for("main.stock_usage_home"))
 
-        hpp_acc = Account.query.filter_by(access_code_id=acc.id, code=hpp_code).first()
+        hpp_acc = _get_account(acc, hpp_code)
         if not hpp_acc:
             flash("Akun HPP tidak valid.", "error")
             return redirect(url_for("main.stock_usage_home"))
@@ -2424,9 +2788,8 @@ def stock_usage_home():
 
         u = StockUsage(
             access_code_id=acc.id,
-            date=_parse_date(date_str),
-            item_id=item.id,
-            item_name=item.name,
+            date=usage_date,
+            item=item,
             qty=qty,
             unit_cost=unit_cost,
             total_cost=total_cost,
@@ -2439,7 +2802,7 @@ def stock_usage_home():
 
         item.stock_qty = float(item.stock_qty or 0) - qty
 
-        entry = _create_journal_for_stock_usage(u)
+        entry = _create_journal_for_stock_usage(acc, u)
         u.journal_entry_id = entry.id
 
         db.session.commit()
@@ -2447,11 +2810,14 @@ def stock_usage_home():
         return redirect(url_for("main.stock_usage_home"))
 
     usages = (
-        StockUsage.query.filter_by(access_code_id=acc.id)
+        list_query(StockUsage, StockUsage.item).filter_by(access_code_id=acc.id)
         .order_by(StockUsage.date.desc(), StockUsage.id.desc())
         .limit(50)
         .all()
     )
+    # dropdown cuma dibutuhkan saat render form (GET)
+    items = _item_options(acc)
+    hpp_accounts = _accounts_of_type(acc, "HPP", "Beban")
     return render_template("stock_usage_home.html", items=items, hpp_accounts=hpp_accounts, usages=usages)
 
 
@@ -2461,47 +2827,38 @@ def stock_usage_edit(usage_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    usage = StockUsage.query.filter_by(id=usage_id, access_code_id=acc.id).first_or_404()
-
-    items = Item.query.filter_by(access_code_id=acc.id).order_by(Item.name.asc()).all()
-    hpp_accounts = (
-        Account.query.filter_by(access_code_id=acc.id)
-        .filter(Account.type.in_(["HPP", "Beban"]))
-        .order_by(Account.code.asc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        item_id_str = (request.form.get("item_id") or "").strip()
-        qty_str = (request.form.get("qty") or "").strip()
-        hpp_code = (request.form.get("hpp_account") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not item_id_str or not qty_str or not hpp_code:
-            flash("Tanggal, bahan, qty, dan akun HPP wajib diisi.", "error")
-            return redirect(url_for("main.stock_usage_edit", usage_id=usage.id))
-
-        try:
-            new_qty = float(qty_str)
-            if new_qty <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Qty harus angka > 0.", "error")
-            return redirect(url_for("main.stock_usage_edit", usage_id=usage.id))
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "item_id": "id",
+                "qty": "number",
+                "hpp_account": "text",
+                "memo": "text?",
+            },
+            "Tanggal, bahan, qty, dan akun HPP wajib diisi.",
+            number_msg="Qty harus angka > 0.",
+            id_msg="Bahan tidak valid.",
+        )
+        if form is None:
+            return redirect(url_for("main.stock_usage_edit", usage_id=usage_id))
+        usage_date, item_id, new_qty, hpp_code, memo = form
 
-        new_item = Item.query.filter_by(id=int(item_id_str), access_code_id=acc.id).first()
+        usage = _scoped_or_404(StockUsage, acc, usage_id)
+        _lock_items(acc, usage.item_id, item_id)
+        new_item = _scoped_get(Item, acc, item_id)
         if not new_item:
             flash("Bahan tidak valid.", "error")
-            return redirect(url_for("main.stock_usage_edit", usage_id=usage.id))
+            return redirect(url_for("main.stock_usage_edit", usage_id=usage_id))
 
-        hpp_acc = Account.query.filter_by(access_code_id=acc.id, code=hpp_code).first()
+        hpp_acc = _get_account(acc, hpp_code)
         if not hpp_acc:
             flash("Akun HPP tidak valid.", "error")
-            return redirect(url_for("main.stock_usage_edit", usage_id=usage.id))
+            return redirect(url_for("main.stock_usage_edit", usage_id=usage_id))
 
         # 1) balikin stok dari pemakaian lama
-        old_item = Item.query.filter_by(id=usage.item_id, access_code_id=acc.id).first()
+        old_item = _scoped_get(Item, acc, usage.item_id)
         old_qty = float(usage.qty or 0)
         if old_item:
             old_item.stock_qty = float(old_item.stock_qty or 0) + old_qty
@@ -2513,16 +2870,15 @@ def stock_usage_edit(usage_id: int):
                 "error",
             )
             db.session.rollback()
-            return redirect(url_for("main.stock_usage_edit", usage_id=usage.id))
+            return redirect(url_for("main.stock_usage_edit", usage_id=usage_id))
 
         # 3) apply pemakaian baru
         unit_cost = float(new_item.avg_cost or 0)
         total_cost = new_qty * unit_cost
         new_item.stock_qty = float(new_item.stock_qty or 0) - new_qty
 
-        usage.date = _parse_date(date_str)
-        usage.item_id = new_item.id
-        usage.item_name = new_item.name
+        usage.date = usage_date
+        usage.item = new_item
         usage.qty = new_qty
         usage.unit_cost = unit_cost
         usage.total_cost = total_cost
@@ -2530,21 +2886,17 @@ def stock_usage_edit(usage_id: int):
         usage.hpp_account_name = hpp_acc.name
         usage.memo = memo or None
 
-        # 4) rebuild jurnal (putus FK dulu baru delete entry lama)
-        old_entry_id = getattr(usage, "journal_entry_id", None)
-        if old_entry_id:
-            usage.journal_entry_id = None
-            db.session.flush()
-            _delete_journal_entry_scoped(acc, old_entry_id)
-            db.session.flush()
-
-        entry = _create_journal_for_stock_usage(usage)
-        usage.journal_entry_id = entry.id
+        # 4) rebuild jurnal: entry lama ditulis ulang di tempat
+        _rebuild_journal(acc, usage, _create_journal_for_stock_usage)
 
         db.session.commit()
         flash("Pemakaian stok berhasil diupdate.", "success")
         return redirect(url_for("main.stock_usage_home"))
 
+    usage = _scoped_or_404(StockUsage, acc, usage_id)
+    # dropdown cuma dibutuhkan saat render form (GET)
+    items = _item_options(acc)
+    hpp_accounts = _accounts_of_type(acc, "HPP", "Beban")
     return render_template(
         "stock_usage_edit.html",
         usage=usage,
@@ -2559,21 +2911,15 @@ def stock_usage_delete(usage_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    usage = StockUsage.query.filter_by(id=usage_id, access_code_id=acc.id).first_or_404()
+    usage = _scoped_or_404(StockUsage, acc, usage_id)
 
     # balikin stok
-    item = Item.query.filter_by(id=usage.item_id, access_code_id=acc.id).first()
+    _lock_items(acc, usage.item_id)
+    item = _scoped_get(Item, acc, usage.item_id)
     if item:
         item.stock_qty = float(item.stock_qty or 0) + float(usage.qty or 0)
 
-    # putus FK dulu baru delete entry
-    old_entry_id = getattr(usage, "journal_entry_id", None)
-    if old_entry_id:
-        usage.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, old_entry_id)
-
-    db.session.delete(usage)
+    _delete_with_journal(acc, usage)
     db.session.commit()
     flash("Pemakaian stok berhasil dihapus (stok & jurnal dikembalikan).", "success")
     return redirect(url_for("main.stock_usage_home"))
@@ -2588,6 +2934,7 @@ from sqlalchemy import func, and_
 # REBUILD: inventory + paid flags + rebuild journals (ADMIN)
 # ============================================================
 @bp.post("/admin/rebuild/everything")
+@query_budget(None)  # rebuild massal: jumlah query sebanding jumlah transaksi
 def admin_rebuild_everything():
     guard = _require_admin()
     if guard:
@@ -2606,67 +2953,63 @@ def admin_rebuild_everything():
 # ============================================================
 # EDIT / DELETE + REBUILD (STOK + JURNAL) — scoped helpers
 # ============================================================
-def _delete_journal_entry(entry_id: int | None, acc_id: int | None = None):
-    """
-    Hapus JournalLine + JournalEntry untuk entry_id.
-    Kalau acc_id diberikan, pastikan entry memang milik dapur tersebut.
-    """
-    if not entry_id:
-        return
-
-    q_entry = JournalEntry.query.filter_by(id=entry_id)
-    if acc_id is not None:
-        q_entry = q_entry.filter_by(access_code_id=acc_id)
-
-    entry = q_entry.first()
-    if not entry:
-        return
-
-    JournalLine.query.filter_by(entry_id=entry_id, access_code_id=entry.access_code_id).delete()
-    db.session.delete(entry)
-
-
 def _recalc_purchase_paid_flags(acc_id: int):
+    # pembayaran yang pending di-flush sekali di sini; di dalam loop autoflush
+    # dimatikan supaya SUM berikutnya tidak ikut flush UPDATE baris sebelumnya
     purchases = Purchase.query.filter_by(access_code_id=acc_id).all()
-    for p in purchases:
-        total_paid = (
-            db.session.query(db.func.coalesce(db.func.sum(APayment.amount), 0.0))
-            .filter(APayment.access_code_id == acc_id, APayment.purchase_id == p.id)
-            .scalar()
-            or 0.0
-        )
-        total = float(p.total_amount or 0)
-        p.is_paid = bool(total_paid >= total and total > 0)
-
-
-def _recalc_invoice_paid_fields(acc_id: int):
-    invoices = SalesInvoice.query.filter_by(access_code_id=acc_id).all()
-    for inv in invoices:
-        total_paid = (
-            db.session.query(db.func.coalesce(db.func.sum(ARPayment.amount), 0.0))
-            .filter(ARPayment.access_code_id == acc_id, ARPayment.invoice_id == inv.id)
-            .scalar()
-            or 0.0
-        )
-        inv.paid_amount = float(total_paid)
-        total = float(inv.total_amount or 0)
-
-        if total <= 0:
-            inv.status = "unpaid"
-        elif inv.paid_amount <= 0:
-            inv.status = "unpaid"
-        elif inv.paid_amount >= total:
-            inv.status = "paid"
-            inv.paid_amount = total
-        else:
-            inv.status = "partial"
+    with db.session.no_autoflush:
+        for p in purchases:
+            total_paid = (
+                db.session.query(db.func.coalesce(db.func.sum(APayment.amount), 0.0))
+                .filter(APayment.access_code_id == acc_id, APayment.purchase_id == p.id)
+                .scalar()
+                or 0.0
+            )
+            total = float(p.total_amount or 0)
+            p.is_paid = bool(total_paid >= total and total > 0)
+
+
+def _recalc_invoice_paid_fields(acc_id: int, invoice_ids=None):
+    """
+    paid_amount & status invoice dari total pembayarannya, satu
+    SUM ... GROUP BY invoice_id (bukan SUM per invoice).
+    invoice_ids: hanya invoice itu (edit/hapus satu pembayaran); None = semua.
+    """
+    invoice_q = SalesInvoice.query.filter_by(access_code_id=acc_id)
+    paid_q = (
+        db.session.query(ARPayment.invoice_id, func.sum(ARPayment.amount))
+        .filter(ARPayment.access_code_id == acc_id)
+    )
+    if invoice_ids is not None:
+        ids = {i for i in invoice_ids if i}
+        if not ids:
+            return
+        invoice_q = invoice_q.filter(SalesInvoice.id.in_(ids))
+        paid_q = paid_q.filter(ARPayment.invoice_id.in_(ids))
+
+    # sama seperti purchase: flush sekali (query invoices), sisanya tanpa autoflush
+    invoices = invoice_q.all()
+    with db.session.no_autoflush:
+        paid_by_invoice = dict(paid_q.group_by(ARPayment.invoice_id).all())
+        for inv in invoices:
+            inv.paid_amount = float(paid_by_invoice.get(inv.id) or 0.0)
+            total = float(inv.total_amount or 0)
+
+            if total <= 0:
+                inv.status = "unpaid"
+            elif inv.paid_amount <= 0:
+                inv.status = "unpaid"
+            elif inv.paid_amount >= total:
+                inv.status = "paid"
+                inv.paid_amount = total
+            else:
+                inv.status = "partial"
 
 
 def _rebuild_inventory(acc_id: int):
     items = Item.query.filter_by(access_code_id=acc_id).all()
-    for it in items:
-        it.stock_qty = 0.0
-        it.avg_cost = 0.0
+    # replay di float lokal [qty, avg] per item; atribut ORM ditulis sekali di akhir
+    state = {it.id: [0.0, 0.0] for it in items}
 
     purchase_rows = (
         db.session.query(PurchaseItem, Purchase)
@@ -2690,37 +3033,34 @@ def _rebuild_inventory(acc_id: int):
         events.append((u.date, 1, "usage", u))
     events.sort(key=lambda x: (x[0] or datetime.min, x[1]))
 
-    item_map = {it.id: it for it in items}
-
     for _, _, etype, obj in events:
         if etype == "purchase":
             pi: PurchaseItem = obj
-            it = item_map.get(pi.item_id)
-            if not it:
+            st = state.get(pi.item_id)
+            if st is None:
                 continue
             qty = float(pi.qty or 0)
-            price = float(pi.price or 0)
             if qty <= 0:
                 continue
 
-            total_cost_existing = float(it.stock_qty or 0) * float(it.avg_cost or 0)
-            total_cost_new = qty * price
-            new_qty = float(it.stock_qty or 0) + qty
-            it.avg_cost = (total_cost_existing + total_cost_new) / new_qty if new_qty > 0 else 0.0
-            it.stock_qty = new_qty
+            cur_qty, cur_avg = st
+            new_qty = cur_qty + qty
+            st[0] = new_qty
+            st[1] = (cur_qty * cur_avg + qty * float(pi.price or 0)) / new_qty
 
         elif etype == "usage":
             u: StockUsage = obj
-            it = item_map.get(u.item_id)
-            if not it:
+            st = state.get(u.item_id)
+            if st is None:
                 continue
             qty = float(u.qty or 0)
             if qty <= 0:
                 continue
 
-            it.stock_qty = float(it.stock_qty or 0) - qty
-            if it.stock_qty < 0:
-                it.stock_qty = 0.0
+            st[0] = max(st[0] - qty, 0.0)
+
+    for it in items:
+        it.stock_qty, it.avg_cost = state[it.id]
 
 
 def _rebuild_all_journals(acc_id: int):
@@ -2732,73 +3072,79 @@ def _rebuild_all_journals(acc_id: int):
     if not acc:
         raise Exception("AccessCode tidak ditemukan untuk rebuild jurnal.")
 
-    JournalLine.query.filter_by(access_code_id=acc_id).delete()
-    JournalEntry.query.filter_by(access_code_id=acc_id).delete()
-
+    # putus FK dokumen dulu, baru hapus entry (lines ikut via ON DELETE CASCADE)
     CashTransaction.query.filter_by(access_code_id=acc_id).update({CashTransaction.journal_entry_id: None})
     Purchase.query.filter_by(access_code_id=acc_id).update({Purchase.journal_entry_id: None})
     APayment.query.filter_by(access_code_id=acc_id).update({APayment.journal_entry_id: None})
     StockUsage.query.filter_by(access_code_id=acc_id).update({StockUsage.journal_entry_id: None})
     SalesInvoice.query.filter_by(access_code_id=acc_id).update({SalesInvoice.journal_entry_id: None})
     ARPayment.query.filter_by(access_code_id=acc_id).update({ARPayment.journal_entry_id: None})
+    JournalEntry.query.filter_by(access_code_id=acc_id).delete()
 
     db.session.flush()
 
-    txs = (
-        CashTransaction.query.filter_by(access_code_id=acc_id)
-        .order_by(CashTransaction.date.asc(), CashTransaction.id.asc())
-        .all()
-    )
-    for tx in txs:
-        _rebuild_journal_for_cash(acc, tx)
-
-    purchases = (
-        Purchase.query.filter_by(access_code_id=acc_id)
-        .order_by(Purchase.date.asc(), Purchase.id.asc())
-        .all()
-    )
-    for p in purchases:
-        entry = _create_journal_for_purchase(p)
-        p.journal_entry_id = entry.id
-
-    pays = (
-        APayment.query.filter_by(access_code_id=acc_id)
-        .order_by(APayment.date.asc(), APayment.id.asc())
-        .all()
-    )
-    for pay in pays:
-        entry = _create_journal_for_ap_payment(pay)
-        pay.journal_entry_id = entry.id
-
-    usages = (
-        StockUsage.query.filter_by(access_code_id=acc_id)
-        .order_by(StockUsage.date.asc(), StockUsage.id.asc())
-        .all()
-    )
-    for u in usages:
-        entry = _create_journal_for_stock_usage(u)
-        u.journal_entry_id = entry.id
-
-    invoices = (
-        SalesInvoice.query.filter_by(access_code_id=acc_id)
-        .order_by(SalesInvoice.date.asc(), SalesInvoice.id.asc())
-        .all()
-    )
-    for inv in invoices:
-        entry = _create_journal_for_invoice(inv)
-        inv.journal_entry_id = entry.id
+    # semua line jurnal rebuild masuk lewat satu INSERT di akhir
+    with _batched_journal_lines(acc):
+        txs = (
+            CashTransaction.query.filter_by(access_code_id=acc_id)
+            .order_by(CashTransaction.date.asc(), CashTransaction.id.asc())
+            .all()
+        )
+        for tx in txs:
+            _rebuild_journal_for_cash(acc, tx)
 
-    arps = (
-        ARPayment.query.filter_by(access_code_id=acc_id)
-        .order_by(ARPayment.date.asc(), ARPayment.id.asc())
-        .all()
-    )
-    for p in arps:
-        inv = SalesInvoice.query.filter_by(access_code_id=acc_id, id=p.invoice_id).first()
-        if not inv:
-            continue
-        entry = _create_journal_for_ar_payment(p, inv)
-        p.journal_entry_id = entry.id
+        purchases = (
+            Purchase.query.filter_by(access_code_id=acc_id)
+            .order_by(Purchase.date.asc(), Purchase.id.asc())
+            .all()
+        )
+        accounts = _load_accounts(acc, {"10051", "20011"})
+        for p in purchases:
+            entry = _create_journal_for_purchase(acc, p, accounts)
+            p.journal_entry_id = entry.id
+
+        pays = (
+            APayment.query.filter_by(access_code_id=acc_id)
+            .order_by(APayment.date.asc(), APayment.id.asc())
+            .all()
+        )
+        accounts = _load_accounts(acc, {"20011"} | {pay.cash_account_code for pay in pays})
+        for pay in pays:
+            entry = _create_journal_for_ap_payment(acc, pay, accounts)
+            pay.journal_entry_id = entry.id
+
+        usages = (
+            StockUsage.query.filter_by(access_code_id=acc_id)
+            .order_by(StockUsage.date.asc(), StockUsage.id.asc())
+            .all()
+        )
+        accounts = _load_accounts(acc, {"10051"} | {u.hpp_account_code for u in usages})
+        for u in usages:
+            entry = _create_journal_for_stock_usage(acc, u, accounts)
+            u.journal_entry_id = entry.id
+
+        invoices = (
+            SalesInvoice.query.filter_by(access_code_id=acc_id)
+            .order_by(SalesInvoice.date.asc(), SalesInvoice.id.asc())
+            .all()
+        )
+        for inv in invoices:
+            entry = _create_journal_for_invoice(acc, inv)
+            inv.journal_entry_id = entry.id
+
+        # invoice di-load sekaligus (selectin), bukan satu SELECT per pembayaran
+        arps = (
+            ARPayment.query.filter_by(access_code_id=acc_id)
+            .options(selectinload(ARPayment.invoice))
+            .order_by(ARPayment.date.asc(), ARPayment.id.asc())
+            .all()
+        )
+        for p in arps:
+            inv = p.invoice
+            if not inv or inv.access_code_id != acc_id:
+                continue
+            entry = _create_journal_for_ar_payment(acc, p, inv)
+            p.journal_entry_id = entry.id
 
 
 def _rebuild_everything():
@@ -2820,67 +3166,66 @@ def _rebuild_everything():
 # AR PAYMENT - EDIT / DELETE (yang versi bawah file kamu) — scoped
 # ============================================================
 @bp.route("/ar/payments/<int:pay_id>/edit", methods=["GET", "POST"])
+@query_budget(5)
 def ar_payment_edit(pay_id: int):
     acc = _require_access()
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    pay = ARPayment.query.filter_by(access_code_id=acc.id, id=pay_id).first_or_404()
-
-    cash_accounts = (
-        Account.query.filter_by(access_code_id=acc.id, type="Kas & Bank")
-        .order_by(Account.code.asc())
-        .all()
-    )
-    invoices = (
-        SalesInvoice.query.filter_by(access_code_id=acc.id)
-        .order_by(SalesInvoice.date.desc(), SalesInvoice.id.desc())
-        .all()
-    )
-
     if request.method == "POST":
-        date_str = (request.form.get("date") or "").strip()
-        invoice_id = (request.form.get("invoice_id") or "").strip()
-        cash_code = (request.form.get("cash_account") or "").strip()
-        amount_str = (request.form.get("amount") or "").strip()
-        memo = (request.form.get("memo") or "").strip()
-
-        if not date_str or not invoice_id or not cash_code or not amount_str:
-            flash("Field wajib belum lengkap.", "error")
+        # semua validasi input dulu, baru sentuh DB
+        form = _clean_form(
+            {
+                "date": "date",
+                "invoice_id": "id",
+                "cash_account": "text",
+                "amount": "number",
+                "memo": "text?",
+            },
+            "Field wajib belum lengkap.",
+            id_msg="Invoice tidak ditemukan.",
+        )
+        if form is None:
             return redirect(url_for("main.ar_payment_edit", pay_id=pay_id))
+        pay_date, invoice_id, cash_code, amt, memo = form
 
-        inv = SalesInvoice.query.filter_by(access_code_id=acc.id, id=int(invoice_id)).first()
+        pay = _scoped_or_404(ARPayment, acc, pay_id)
+        old_invoice_id = pay.invoice_id
+        inv = _scoped_get(SalesInvoice, acc, invoice_id)
         if not inv:
             flash("Invoice tidak ditemukan.", "error")
             return redirect(url_for("main.ar_payment_edit", pay_id=pay_id))
 
-        cash_acc = Account.query.filter_by(access_code_id=acc.id, code=cash_code).first()
+        cash_acc = _get_account(acc, cash_code)
         if not cash_acc:
             flash("Akun kas/bank tidak valid.", "error")
             return redirect(url_for("main.ar_payment_edit", pay_id=pay_id))
 
-        try:
-            amt = float(amount_str)
-            if amt <= 0:
-                raise ValueError()
-        except ValueError:
-            flash("Nominal harus angka > 0.", "error")
-            return redirect(url_for("main.ar_payment_edit", pay_id=pay_id))
-
-        pay.date = _parse_date(date_str)
-        pay.invoice_id = inv.id
-        pay.invoice_no = inv.invoice_no
+        pay.date = pay_date
+        pay.invoice = inv
         pay.cash_account_code = cash_acc.code
         pay.cash_account_name = cash_acc.name
         pay.amount = amt
         pay.memo = memo or None
 
-        db.session.flush()
-        _rebuild_everything()
+        # cukup jurnal pembayaran ini + status invoice lama & baru;
+        # stok/jurnal/invoice lain tidak berubah
+        _rebuild_journal_for_ar_payment(acc, pay)
+        _recalc_invoice_paid_fields(acc.id, (old_invoice_id, inv.id))
+        db.session.commit()
 
         flash("Pembayaran piutang diupdate.", "success")
         return redirect(url_for("main.ar_payment_home"))
 
+    pay = _scoped_or_404(ARPayment, acc, pay_id)
+    # dropdown cuma dibutuhkan saat render form (GET)
+    cash_accounts = _accounts_of_type(acc, "Kas & Bank")
+    invoices = (
+        db.session.query(*_INVOICE_OPTION_COLS)
+        .filter(SalesInvoice.access_code_id == acc.id)
+        .order_by(SalesInvoice.date.desc(), SalesInvoice.id.desc())
+        .all()
+    )
     return render_template("ar_payment_edit.html", pay=pay, cash_accounts=cash_accounts, invoices=invoices)
 
 
@@ -2890,19 +3235,13 @@ def ar_payment_delete(pay_id: int):
     if not acc:
         return redirect(url_for("main.enter_code"))
 
-    pay = ARPayment.query.filter_by(access_code_id=acc.id, id=pay_id).first_or_404()
+    pay = _scoped_or_404(ARPayment, acc, pay_id)
+    invoice_id = pay.invoice_id
 
-    # putus FK jurnal dulu (kalau ada) supaya rebuild tidak nyangkut
-    entry_id = getattr(pay, "journal_entry_id", None)
-    if entry_id:
-        pay.journal_entry_id = None
-        db.session.flush()
-        _delete_journal_entry_scoped(acc, entry_id)
+    _delete_with_journal(acc, pay)
 
-    db.session.delete(pay)
-    db.session.flush()
-
-    _rebuild_everything()
+    _recalc_invoice_paid_fields(acc.id, (invoice_id,))
+    db.session.commit()
 
     flash("Pembayaran piutang dihapus.", "success")
     return redirect(url_for("main.ar_payment_home"))
@@ -2,7 +2,7 @@
 from datetime import datetime, timedelta
 import secrets
 
-from bukudapur_mbg import create_app, db
+from bukudapur_mbg import bypass_tenant_rls, create_app, db
 from bukudapur_mbg.models import AccessCode
 
 def now_utc():
@@ -76,7 +76,7 @@ def main():
     p_create = sub.add_parser("create")
     p_create.add_argument("--name", required=True)
     p_create.add_argument("--days", type=int, required=True)
-    p_create.add_argument("--status", default="active")
+    p_create.add_argument("--status", default="active", choices=["active", "trial"])
 
     p_extend = sub.add_parser("extend")
     p_extend.add_argument("--code", required=True)
@@ -89,6 +89,7 @@ def main():
 
     app = create_app()
     with app.app_context():
+        bypass_tenant_rls()
         if args.cmd == "list":
             list_codes(args.limit)
         elif args.cmd == "create":
@@ -4,6 +4,8 @@ from logging.config import fileConfig
 from flask import current_app
 
 from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -24,6 +26,19 @@ def get_engine():
         return current_app.extensions['migrate'].db.engine
 
 
+def get_migration_engine():
+    """
+    Engine sekali pakai (NullPool) untuk migrasi: PRAGMA / setting sesi yang
+    dipasang di sini ikut hilang saat koneksinya ditutup, tidak pernah balik
+    ke pool engine app (MIGRATION_MODE=sync/async jalan di proses app).
+    SQLite :memory: tetap pakai engine app: koneksi baru = database kosong.
+    """
+    engine = get_engine()
+    if engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:"):
+        return engine, False
+    return create_engine(engine.url, poolclass=NullPool), True
+
+
 def get_engine_url():
     try:
         return get_engine().url.render_as_string(hide_password=False).replace(
@@ -94,17 +109,47 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
-    connectable = get_engine()
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=get_metadata(),
-            **conf_args
-        )
+    connectable, throwaway = get_migration_engine()
 
-        with context.begin_transaction():
-            context.run_migrations()
+    try:
+        with connectable.connect() as connection:
+            sqlite = connection.dialect.name == "sqlite"
+            postgres = connection.dialect.name == "postgresql"
+            # SQLite: batch_alter_table drop+recreate tabel; dengan foreign_keys=ON
+            # (dipasang app di setiap koneksi) itu bisa gagal atau ikut meng-CASCADE
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                connection.commit()
+            # Postgres: policy RLS fail-closed; migrasi (backfill/UPDATE data) perlu
+            # lihat semua dapur -> bypass level sesi, karena autocommit_block memutus
+            # transaksi (SET LOCAL ikut hilang). Di-RESET di finally, dan koneksinya
+            # dari engine sekali pakai, jadi tidak pernah dipakai request dapur.
+            if postgres:
+                connection.exec_driver_sql("SELECT set_config('app.bypass_rls', 'on', false)")
+                connection.commit()
+
+            try:
+                context.configure(
+                    connection=connection,
+                    target_metadata=get_metadata(),
+                    **conf_args
+                )
+
+                with context.begin_transaction():
+                    context.run_migrations()
+            finally:
+                if postgres:
+                    connection.rollback()
+                    connection.exec_driver_sql("RESET app.bypass_rls")
+                    connection.commit()
+                # koneksi engine app (:memory:) balik ke pool: FK wajib ON lagi
+                if sqlite:
+                    connection.rollback()
+                    connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                    connection.commit()
+    finally:
+        if throwaway:
+            connectable.dispose()
 
 
 if context.is_offline_mode():
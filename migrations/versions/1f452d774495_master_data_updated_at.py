@@ -0,0 +1,41 @@
+"""master data updated_at
+
+Revision ID: 1f452d774495
+Revises: 4415431db4c6
+Create Date: 2026-10-16 15:01:48.209042
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f452d774495'
+down_revision = '4415431db4c6'
+branch_labels = None
+depends_on = None
+
+
+# kolom nullable tanpa default: ADD COLUMN instan di Postgres, tidak perlu backfill.
+# index (tenant, updated_at) untuk MAX(updated_at) di versi cache COA / supplier
+_TABLES = ('accounts', 'suppliers')
+
+
+def upgrade():
+    for table in _TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        for table in _TABLES:
+            op.create_index(f'ix_{table}_tenant_updated', table, ['access_code_id', 'updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in _TABLES:
+            op.drop_index(f'ix_{table}_tenant_updated', table_name=table, postgresql_concurrently=True)
+
+    for table in reversed(_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,41 @@
+"""cash transaction kind
+
+Revision ID: 2a7f443dbaea
+Revises: b0a4150bc904
+Create Date: 2026-10-16 14:38:22.342038
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a7f443dbaea'
+down_revision = 'b0a4150bc904'
+branch_labels = None
+depends_on = None
+
+
+# kind SMALLINT (CodedString): 0 = cash, 1 = sale. Penjualan lama dikenali dari
+# memo "[SALE]%" sekali di sini; sesudahnya list penjualan pakai index
+# (tenant, kind, date, id), bukan LIKE di memo
+
+
+def upgrade():
+    with op.batch_alter_table('cash_transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kind', sa.SmallInteger(), server_default='0', nullable=False))
+        batch_op.create_check_constraint('ck_cash_transactions_kind', 'kind BETWEEN 0 AND 1')
+
+    op.execute("UPDATE cash_transactions SET kind = 1 WHERE direction = 0 AND memo LIKE '[SALE]%'")
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_cash_transactions_tenant_kind_date', 'cash_transactions', ['access_code_id', 'kind', 'date', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_cash_transactions_tenant_kind_date', table_name='cash_transactions', postgresql_concurrently=True)
+
+    with op.batch_alter_table('cash_transactions', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_cash_transactions_kind', type_='check')
+        batch_op.drop_column('kind')
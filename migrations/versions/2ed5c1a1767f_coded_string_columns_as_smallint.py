@@ -0,0 +1,82 @@
+"""coded string columns as smallint
+
+Revision ID: 2ed5c1a1767f
+Revises: 7d7082e56810
+Create Date: 2026-10-16 13:37:21.385347
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2ed5c1a1767f'
+down_revision = '7d7082e56810'
+branch_labels = None
+depends_on = None
+
+
+# (tabel, kolom, panjang VARCHAR lama, nilai berurutan = kode SMALLINT)
+CODED_COLUMNS = (
+    ('access_codes', 'status', 16, ('trial', 'active', 'expired')),
+    ('journal_entries', 'source', 30, (
+        'manual', 'cash', 'purchase', 'ap_payment',
+        'stock_usage', 'sales_invoice', 'ar_payment',
+    )),
+    ('cash_transactions', 'direction', 5, ('in', 'out')),
+    ('sales_invoices', 'status', 20, ('unpaid', 'partial', 'paid')),
+)
+
+
+def _case(expr, pairs):
+    whens = ' '.join(f"WHEN '{old}' THEN '{new}'" for old, new in pairs)
+    return f'CASE {expr} {whens} END'
+
+
+def _check_known(table, column, expr, known):
+    # CASE tanpa ELSE mengubah nilai asing jadi NULL dan alter NOT NULL gagal
+    # di tengah jalan; hentikan lebih awal dengan daftar nilai yang bermasalah
+    allowed = ', '.join(f"'{v}'" for v in known)
+    bad = op.get_bind().execute(sa.text(
+        f'SELECT DISTINCT {column} FROM {table} '
+        f'WHERE {column} IS NULL OR {expr} NOT IN ({allowed})'
+    )).scalars().all()
+    if bad:
+        raise RuntimeError(
+            f'{table}.{column} berisi nilai yang tidak dikenal: '
+            + ', '.join(repr(v) for v in bad)
+            + f' (yang dikenal: {allowed}); perbaiki datanya lalu ulangi migrasi'
+        )
+
+
+def upgrade():
+    for table, column, length, values in CODED_COLUMNS:
+        # data lama bisa beda huruf besar / ada spasi: samakan dulu
+        expr = f'lower(trim({column}))'
+        _check_known(table, column, expr, values)
+        # string -> kode angka (masih disimpan sebagai teks), lalu ganti tipe
+        op.execute(
+            f'UPDATE {table} SET {column} = '
+            + _case(expr, [(v, str(i)) for i, v in enumerate(values)])
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.String(length=length),
+                   type_=sa.SmallInteger(),
+                   postgresql_using=f'{column}::smallint',
+                   existing_nullable=False)
+
+
+def downgrade():
+    for table, column, length, values in reversed(CODED_COLUMNS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.SmallInteger(),
+                   type_=sa.String(length=length),
+                   postgresql_using=f'{column}::varchar',
+                   existing_nullable=False)
+        _check_known(table, column, column, [str(i) for i in range(len(values))])
+        op.execute(
+            f'UPDATE {table} SET {column} = '
+            + _case(column, [(str(i), v) for i, v in enumerate(values)])
+        )
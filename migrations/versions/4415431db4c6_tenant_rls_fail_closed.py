@@ -0,0 +1,67 @@
+"""tenant rls fail closed
+
+Revision ID: 4415431db4c6
+Revises: 2a7f443dbaea
+Create Date: 2026-10-16 14:44:56.427185
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4415431db4c6'
+down_revision = '2a7f443dbaea'
+branch_labels = None
+depends_on = None
+
+
+TENANT_TABLES = (
+    'accounts',
+    'suppliers',
+    'items',
+    'journal_entries',
+    'journal_lines',
+    'cash_transactions',
+    'purchases',
+    'purchase_items',
+    'ap_payments',
+    'sales_invoices',
+    'sales_invoice_lines',
+    'ar_payments',
+    'stock_usages',
+)
+
+# fail-closed: tanpa app.tenant_id tidak ada baris yang lolos. Admin, CLI
+# (manage_codes) & migrasi lintas dapur men-set app.bypass_rls = 'on' secara eksplisit
+TENANT_PREDICATE = (
+    "current_setting('app.bypass_rls', true) = 'on' "
+    "OR access_code_id = NULLIF(current_setting('app.tenant_id', true), '')::int"
+)
+
+# policy lama (6fb7288d502b): setting kosong = semua baris lolos
+OLD_TENANT_PREDICATE = (
+    "COALESCE(current_setting('app.tenant_id', true), '') = '' "
+    "OR access_code_id = NULLIF(current_setting('app.tenant_id', true), '')::int"
+)
+
+
+def _alter_policies(predicate):
+    for table in TENANT_TABLES:
+        op.execute(
+            f'ALTER POLICY tenant_isolation ON {table} '
+            f'USING ({predicate}) WITH CHECK ({predicate})'
+        )
+
+
+def upgrade():
+    # RLS hanya ada di Postgres
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _alter_policies(TENANT_PREDICATE)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _alter_policies(OLD_TENANT_PREDICATE)
@@ -0,0 +1,38 @@
+"""payment list indexes with id tiebreak
+
+Revision ID: 4f3aa7609cb2
+Revises: c3a300304daf
+Create Date: 2026-10-16 14:01:47.320173
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f3aa7609cb2'
+down_revision = 'c3a300304daf'
+branch_labels = None
+depends_on = None
+
+
+# list pembayaran diurutkan (date DESC, id DESC): id ikut di index supaya
+# halaman list cukup index scan mundur, tanpa sort tambahan
+TABLES = ('ap_payments', 'ar_payments')
+
+
+def _recreate(columns):
+    # CONCURRENTLY (Postgres) supaya deploy tidak lock tabel; harus di luar transaksi
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            name = f'ix_{table}_tenant_date'
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def upgrade():
+    _recreate(['access_code_id', 'date', 'id'])
+
+
+def downgrade():
+    _recreate(['access_code_id', 'date'])
@@ -0,0 +1,37 @@
+"""check constraints on coded columns
+
+Revision ID: 660786a3b47b
+Revises: bbe3259c6a31
+Create Date: 2026-10-16 13:42:07.074758
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '660786a3b47b'
+down_revision = 'bbe3259c6a31'
+branch_labels = None
+depends_on = None
+
+
+# (tabel, nama constraint, kondisi) -> kode SMALLINT dari CodedString
+CHECKS = (
+    ('access_codes', 'ck_access_codes_status', 'status BETWEEN 0 AND 2'),
+    ('journal_entries', 'ck_journal_entries_source', 'source BETWEEN 0 AND 6'),
+    ('cash_transactions', 'ck_cash_transactions_direction', 'direction BETWEEN 0 AND 1'),
+    ('sales_invoices', 'ck_sales_invoices_status', 'status BETWEEN 0 AND 2'),
+)
+
+
+def upgrade():
+    for table, name, condition in CHECKS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_check_constraint(name, condition)
+
+
+def downgrade():
+    for table, name, _condition in reversed(CHECKS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(name, type_='check')
@@ -0,0 +1,64 @@
+"""tenant row level security
+
+Revision ID: 6fb7288d502b
+Revises: f0854dd9d023
+Create Date: 2026-10-16 13:32:50.043587
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6fb7288d502b'
+down_revision = 'f0854dd9d023'
+branch_labels = None
+depends_on = None
+
+
+TENANT_TABLES = (
+    'accounts',
+    'suppliers',
+    'items',
+    'journal_entries',
+    'journal_lines',
+    'cash_transactions',
+    'purchases',
+    'purchase_items',
+    'ap_payments',
+    'sales_invoices',
+    'sales_invoice_lines',
+    'ar_payments',
+    'stock_usages',
+)
+
+# app.tenant_id di-set per transaksi oleh aplikasi (set_config(..., true)).
+# Kalau belum di-set (admin, CLI, migrasi) policy tidak menyaring.
+TENANT_PREDICATE = (
+    "COALESCE(current_setting('app.tenant_id', true), '') = '' "
+    "OR access_code_id = NULLIF(current_setting('app.tenant_id', true), '')::int"
+)
+
+
+def upgrade():
+    # RLS hanya ada di Postgres
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in TENANT_TABLES:
+        op.execute(f'ALTER TABLE {table} ENABLE ROW LEVEL SECURITY')
+        op.execute(f'ALTER TABLE {table} FORCE ROW LEVEL SECURITY')
+        op.execute(
+            f'CREATE POLICY tenant_isolation ON {table} '
+            f'USING ({TENANT_PREDICATE}) WITH CHECK ({TENANT_PREDICATE})'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in TENANT_TABLES:
+        op.execute(f'DROP POLICY IF EXISTS tenant_isolation ON {table}')
+        op.execute(f'ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY')
+        op.execute(f'ALTER TABLE {table} DISABLE ROW LEVEL SECURITY')
@@ -0,0 +1,177 @@
+"""server side created_at and is_active defaults
+
+Revision ID: 7d7082e56810
+Revises: 200f4da75026
+Create Date: 2026-10-16 13:34:42.745660
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d7082e56810'
+down_revision = '200f4da75026'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # created_at/is_active diisi database (bukan Python) saat INSERT
+    with op.batch_alter_table('access_codes', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=sa.true())
+
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=sa.true())
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=sa.true())
+
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('cash_transactions', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('ap_payments', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('sales_invoices', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('ar_payments', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+    with op.batch_alter_table('stock_usages', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=sa.text('CURRENT_TIMESTAMP'))
+
+
+def downgrade():
+    with op.batch_alter_table('stock_usages', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('ar_payments', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               server_default=None)
+
+    with op.batch_alter_table('sales_invoices', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=True,
+               server_default=None)
+
+    with op.batch_alter_table('ap_payments', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('purchases', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('cash_transactions', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=None)
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('suppliers', schema=None) as batch_op:
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=None)
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.alter_column('is_active',
+               existing_type=sa.Boolean(),
+               existing_nullable=False,
+               server_default=None)
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
+
+    with op.batch_alter_table('access_codes', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               existing_nullable=False,
+               server_default=None)
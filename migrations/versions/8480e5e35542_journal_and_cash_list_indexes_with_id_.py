@@ -0,0 +1,34 @@
+"""journal and cash list indexes with id tiebreak
+
+Revision ID: 8480e5e35542
+Revises: 8eb78a9412aa
+Create Date: 2026-10-16 14:13:23.114303
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8480e5e35542'
+down_revision = '8eb78a9412aa'
+branch_labels = None
+depends_on = None
+
+
+# list jurnal & kas diurutkan (date DESC, id DESC); list kas tanpa filter
+# direction tidak bisa pakai index (tenant, date, direction) untuk tiebreak id
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_journal_entries_tenant_date', table_name='journal_entries', postgresql_concurrently=True)
+        op.create_index('ix_journal_entries_tenant_date', 'journal_entries', ['access_code_id', 'date', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_cash_transactions_tenant_date', 'cash_transactions', ['access_code_id', 'date', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_cash_transactions_tenant_date', table_name='cash_transactions', postgresql_concurrently=True)
+        op.drop_index('ix_journal_entries_tenant_date', table_name='journal_entries', postgresql_concurrently=True)
+        op.create_index('ix_journal_entries_tenant_date', 'journal_entries', ['access_code_id', 'date'], unique=False, postgresql_concurrently=True)
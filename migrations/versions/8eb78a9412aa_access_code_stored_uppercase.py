@@ -0,0 +1,28 @@
+"""access code stored uppercase
+
+Revision ID: 8eb78a9412aa
+Revises: 4f3aa7609cb2
+Create Date: 2026-10-16 14:04:52.346401
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8eb78a9412aa'
+down_revision = '4f3aa7609cb2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # data lama yang sempat tersimpan lowercase dinormalkan dulu
+    op.execute("UPDATE access_codes SET code = upper(code) WHERE code <> upper(code)")
+    with op.batch_alter_table('access_codes', schema=None) as batch_op:
+        batch_op.create_check_constraint('ck_access_codes_code_upper', 'code = upper(code)')
+
+
+def downgrade():
+    with op.batch_alter_table('access_codes', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_access_codes_code_upper', type_='check')
@@ -0,0 +1,36 @@
+"""journal entry updated_at
+
+Revision ID: b0a4150bc904
+Revises: 8480e5e35542
+Create Date: 2026-10-16 14:20:29.518518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0a4150bc904'
+down_revision = '8480e5e35542'
+branch_labels = None
+depends_on = None
+
+
+# kolom nullable tanpa default: ADD COLUMN instan di Postgres, tidak perlu backfill.
+# index (tenant, updated_at) untuk MAX(updated_at) di sidik cache dashboard
+
+
+def upgrade():
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_journal_entries_tenant_updated', 'journal_entries', ['access_code_id', 'updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_journal_entries_tenant_updated', table_name='journal_entries', postgresql_concurrently=True)
+
+    with op.batch_alter_table('journal_entries', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,49 @@
+"""cascade journal lines on entry delete
+
+Revision ID: c3a300304daf
+Revises: 7bb7128e374b
+Create Date: 2026-10-16 13:56:06.134934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a300304daf'
+down_revision = '7bb7128e374b'
+branch_labels = None
+depends_on = None
+
+
+# FK entry_id di initial schema tidak bernama: Postgres kasih nama default,
+# SQLite tidak punya nama -> batch pakai naming_convention supaya bisa di-drop
+PG_DEFAULT_NAME = 'journal_lines_entry_id_fkey'
+FK_NAME = 'fk_journal_lines_entry_id'
+SQLITE_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s'}
+
+
+def _swap_fk(old_name, new_name, ondelete):
+    if op.get_bind().dialect.name == 'sqlite':
+        batch = op.batch_alter_table(
+            'journal_lines', schema=None, naming_convention=SQLITE_CONVENTION
+        )
+    else:
+        batch = op.batch_alter_table('journal_lines', schema=None)
+    with batch as batch_op:
+        batch_op.drop_constraint(old_name, type_='foreignkey')
+        batch_op.create_foreign_key(
+            new_name, 'journal_entries', ['entry_id'], ['id'], ondelete=ondelete
+        )
+
+
+def _original_name():
+    return FK_NAME if op.get_bind().dialect.name == 'sqlite' else PG_DEFAULT_NAME
+
+
+def upgrade():
+    _swap_fk(_original_name(), FK_NAME, 'CASCADE')
+
+
+def downgrade():
+    _swap_fk(FK_NAME, _original_name(), None)
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bukudapur_mbg import create_app, db
+from bukudapur_mbg.models import AccessCode, Item, Supplier
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # SQL_QUERY_STRICT: view GET yang lewat @query_budget langsung AssertionError
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("SQL_QUERY_STRICT", "1")
+    monkeypatch.setenv("MIGRATION_MODE", "skip")
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """Client yang sudah masuk sebagai satu dapur dengan COA standar + transaksi contoh."""
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add(
+            AccessCode(code="T1", status="active", start_at=now, expires_at=now + timedelta(days=3))
+        )
+        db.session.commit()
+
+    c = app.test_client()
+    c.post("/enter", data={"code": "T1"})
+    c.post("/master/accounts/seed")
+    c.post("/master/suppliers", data={"name": "Sup"})
+    c.post("/master/items", data={"name": "Beras", "unit": "kg"})
+    with app.app_context():
+        item_id = db.session.query(Item.id).scalar()
+        supplier_id = db.session.query(Supplier.id).scalar()
+
+    for url, data in [
+        ("/cash", dict(date="2026-01-02", direction="in", cash_account="10011", counter_account="30011", amount="1000000")),
+        ("/expenses", dict(date="2026-01-03", cash_account="10011", expense_account="60012", amount="50000")),
+        ("/purchase", dict(date="2026-01-05", item_id=item_id, supplier_id=supplier_id, qty="10", price="1000")),
+        ("/stock-usage", dict(date="2026-01-06", item_id=item_id, qty="2", hpp_account="50011")),
+        ("/ap-payment", dict(date="2026-01-07", cash_account="10011", amount="10000")),
+    ]:
+        assert c.post(url, data=data).status_code == 302
+    return c